@@ -1,6 +1,6 @@
-from services import State, Forecasts, Hurricane, AlertStatistics, alerts, OtlkHandler
+from services import State, Forecasts, Hurricane, AlertStatistics, alerts, OtlkHandler, alertStore
 from services.syslogger import log
-from utils import Time, identifier, determiner, generate_alert_image, ucf_in_or_near_polygon, channels, generate_outlook_image
+from utils import Time, identifier, determiner, poiIndex, channels, zoneManager, renderPool, scheduler, dispatcher
 import config
 import asyncio
 import discord
@@ -11,6 +11,8 @@ import time
 from datetime import datetime, timezone, timedelta
 import aiohttp
 import re
+import copy
+import functools
 
 tManager = Time()
 deter = determiner
@@ -31,6 +33,33 @@ severity_colors = { # This severity index is based on the severity property in a
     "Unknown": 0x808080    # Gray
 }
 
+EDIT_ACTIONS = {"CON", "EXT", "COR"} # VTEC actions that update an event already posted. Its messages are edited in place.
+CLOSE_ACTIONS = {"CAN", "EXP"} # Actions that end an event. Its messages get a short note instead of a new post.
+
+async def send_or_edit(channel, edit=None, content=None, embed=None, file=None) -> discord.Message: # New message, or message id edit changed in place. Edits never ping again.
+    if edit is None:
+        return await channel.send(content=content, embed=embed, file=file)
+    
+    fields = {} # Anything left out stays as it was, ex. the ping on the original message.
+    
+    if content is not None:
+        fields["content"] = content
+        
+    if embed is not None:
+        fields["embed"] = embed
+        fields["attachments"] = [file] if file else [] # The old map goes, the embed points at the new one or none.
+        
+    return await channel.get_partial_message(edit).edit(**fields)
+
+def uploaded_image_url(message: discord.Message) -> str | None: # CDN url of the image uploaded with a message.
+    if message.attachments:
+        return message.attachments[0].url
+    
+    if message.embeds and message.embeds[0].image:
+        return message.embeds[0].image.url
+    
+    return None
+
 '''
 This is the sort of central system basically. This thing manages the services.
 I optimized what I could/wanted to in the moment, further optimization can be expected, well, later.
@@ -39,64 +68,95 @@ I optimized what I could/wanted to in the moment, further optimization can be ex
 class Controller():
     def __init__(self):
         log.info("CONTROLLER INIT")
-        self.posted_alerts = {}
         log.info("CURRENT ALERTS")
+        self.dispatching = {} # Alert id -> task waiting on that alert's deliveries, so a later cycle doesn't queue it again.
         self.establish()
     
     async def run(self):
+        renderPool.start() # Workers warm up (cartopy, map layers) in the background while zones load.
+        await self.load_zones() # Zones must be loaded before the first alert cycle.
+        
+        # Every service runs as its own task. Alerts poll on their own clock, nothing else can hold them up.
+        scheduler.every("alerts", self.alert_job, self.alert_poll_delay, jitter=2)
+        scheduler.every("day 1 risk", OtlkHandler.refresh_day1_risk, config.outlookRiskRefresh, jitter=30)
+        scheduler.in_windows("forecast", self.forecast_job, fcast.open_windows)
+        scheduler.in_windows("hurricane", self.hurricane_job, hurr.open_windows)
+        scheduler.in_windows("outlooks", self.handle_and_post_outlooks, OtlkHandler.open_windows)
+        scheduler.every("new day", self.new_day_job, 60)
+        
+        await scheduler.run()
+        
+    async def load_zones(self): # Cold start with the API down: keep trying, loudly, instead of sitting logged in with nothing running.
+        delay = 30
+        
         while True:
-            if not channels.synced: channels.sync_channels()
-            
-            await self.handle_and_post_alerts()
-            self.clean()
-            self.save_info()
-            await asyncio.sleep(self.timeDelay)
-            aManager.check_internal()
-            await self.handle_and_post_forecasts()
-            
-            newDay = tManager.is_new_day()
-            
-            if newDay:
-                fcast.reset_states()
-                hurr.reset_states()
-                OtlkHandler.reset_states()
-            
+            try:
+                await zoneManager.initialize()
+                return
+            except Exception as E:
+                log.critical(f"Zones could not be loaded, alerts can't be filtered without them. Retrying in {delay} seconds: {E}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 900)
+        
+    def alert_poll_delay(self) -> float: # Tight while dangerous weather is around, relaxed when it's quiet.
+        return aManager.next_poll_delay(elevated=OtlkHandler.day1_at_least(config.alertPollOutlookRisk))
+        
+    async def alert_job(self):
+        if not channels.synced: channels.sync_channels()
+        
+        await self.handle_and_post_alerts()
+        await aManager.check_internal() # Right after the poll, while the feed's lineage is fresh.
+        self.save_info()
+        
+    async def forecast_job(self):
+        await self.handle_and_post_forecasts()
+        self.save_info()
+        
+    async def hurricane_job(self):
+        await self.handle_and_post_hurricane()
+        self.save_info()
+        
+    async def new_day_job(self):
+        if tManager.is_new_day():
+            fcast.reset_states()
+            hurr.reset_states()
+            OtlkHandler.reset_states()
             self.save_info()
             
-            await asyncio.sleep(self.timeDelay)
-            
-            await self.handle_and_post_outlooks()
-            
-            await asyncio.sleep(self.timeDelay)
-            
-    async def post_to_channel(self, channel, embed, buf=None, url=None): # Handle method of posting to a discord channel.
+    async def post_to_channel(self, channel, embed, buf=None, url=None, content=None, edit=None): # Handle method of posting to a discord channel. content goes alongside an embed, ex. a ping. edit is a message id to change instead.
         timebuffer = 7 # Change to update how much time should be spent before next attempt. Multiplies.
         max_attempts = 4 # Max number of attempts.
         for attempt_num in range(1, max_attempts + 1): # For loop
             try:
                 if isinstance(embed, str):
-                    await channel.send(content=embed)
+                    message = await send_or_edit(channel, edit, content=embed)
                 elif isinstance(embed, discord.Embed):
                     
                     if buf and not url: # Filter for buf object
-                        buf.seek(0)
-                        file = discord.File(fp=buf, filename="alert_map.png")
-                        await channel.send(embed=embed, file=file)
+                        file = discord.File(fp=BytesIO(buf.getvalue()), filename="alert_map.png") # Own copy, other channels may be sending the same buf right now.
+                        message = await send_or_edit(channel, edit, content=content, embed=embed, file=file)
                     elif url and not buf:
+                        embed = embed.copy() # The same embed goes to other channels, don't change theirs.
                         embed.set_image(url=url)
-                        await channel.send(embed=embed)
+                        message = await send_or_edit(channel, edit, content=content, embed=embed)
                     else:
-                        await channel.send(embed=embed)
+                        message = await send_or_edit(channel, edit, content=content, embed=embed)
                 else:
                     log.error("Invalid type!")
                     return False
                     
                 log.info(f"Message successfully sent on attempt {attempt_num}!") # If successful
-                return True
+                return message # The sent message, callers can treat it as True.
             except aiohttp.ClientConnectionError: # Client connection error
                 log.error(f"⚠️ Connection error (attempt {attempt_num}/{max_attempts}): Retrying in {timebuffer * attempt_num} seconds...")
             except aiohttp.ClientError as e: # Client error
                 log.error(f"⚠️ Client error (attempt {attempt_num}/{max_attempts}): Retrying in {timebuffer * attempt_num} seconds...")
+            except discord.NotFound as e:
+                if edit is not None: # The message we meant to edit was deleted, post a new one instead.
+                    log.warn(f"Message {edit} to edit is gone, posting a new one.")
+                    edit = None
+                    continue
+                log.error(f"⚠️ Not found: {e} ... (attempt {attempt_num}/{max_attempts}): Retrying in {timebuffer * attempt_num} seconds...")
             except Exception as e: # Other exceptions
                 log.error(f"⚠️ Unexpected error occurred: {e} ... (attempt {attempt_num}/{max_attempts}): Retrying in {timebuffer * attempt_num} seconds...")
             
@@ -106,6 +166,71 @@ class Controller():
         log.warn(f"Failure to send message after successive attempts! Ending attempt to deliver.")
         return False
         
+    def queue_after_upload(self, embed, buf, waiting, priority, upload): # Done callback of the first channel's send. Queue the rest, reusing its image, or uploading again if it didn't go up.
+        message = None if upload.cancelled() else upload.result()
+        url = uploaded_image_url(message) if message else None
+        
+        for channel, content, edit, future in waiting:
+            if url:
+                send = functools.partial(self.post_to_channel, channel, embed, url=url, content=content, edit=edit)
+            else:
+                send = functools.partial(self.post_to_channel, channel, embed, buf=buf, content=content, edit=edit)
+                
+            queued = dispatcher.submit(channel, send, priority)
+            queued.add_done_callback(lambda done, future=future: future.done() or future.set_result(None if done.cancelled() else done.result()))
+        
+    def deliver(self, alrt, embed, buf, targets, edits=None, note=None) -> list:
+        '''
+        Queue an alert on every (channel, key) in targets, key picking the ping that rides along with the embed.
+        edits maps channel id -> message id already holding this alert's track. Those messages are edited instead, with note
+        as text only when given, with the embed otherwise, and aren't pinged again.
+        Each channel drains its own queue, so this returns right away with one future per channel, each resolving to the message or False.
+        '''
+        edits = edits or {}
+        ping = alrt["SAME_code"] in config.alertCodes and alrt["status"] == "Actual"
+        priority = deter.priority(alrt)
+        upload = None # The first channel's send. When the image is uploaded once, the others are queued after it for the url.
+        waiting = [] # (channel, content, edit, future) queued once the upload is done.
+        futures = []
+        
+        for channel, key in targets:
+            edit = edits.get(str(channel.id))
+            content = config.pings.get(key) if ping and not edit else None
+            
+            if edit and note:
+                futures.append(dispatcher.submit(channel, functools.partial(self.post_to_channel, channel, note, edit=edit), priority))
+                continue
+            
+            if upload is None or not (buf and config.uploadImageOnce):
+                future = dispatcher.submit(channel, functools.partial(self.post_to_channel, channel, embed, buf=buf, content=content, edit=edit), priority)
+                upload = upload or future
+            else: # Not queued yet. A queued send waiting on another channel's queue could wait on a send that's waiting back on it.
+                future = asyncio.get_running_loop().create_future()
+                waiting.append((channel, content, edit, future))
+                
+            futures.append(future)
+            
+        if waiting:
+            upload.add_done_callback(functools.partial(self.queue_after_upload, embed, buf, waiting, priority))
+            
+        return futures
+        
+    async def finish_alert(self, alrt, targets, futures): # Once every channel has had its go, an alert that reached at least one is done.
+        Id = alrt["id"]
+        
+        try:
+            results = await asyncio.gather(*futures)
+            messages = {str(channel.id): message.id for (channel, _), message in zip(targets, results) if message} # Kept so the track's next alert can edit them.
+            
+            if messages and Id in alertStore: # It may have expired out of the store while it was queued.
+                alertStore.mark_posted(Id)
+                alertStore.record_messages(Id, messages)
+                alertStats.add_stat(alrt["countiesAffected"], alrt["SAME_code"])
+                log.info(f"✅🔗 Alert pushed.")
+                log.info("Sent " + Id)
+        finally:
+            self.dispatching.pop(Id, None)
+        
             
     def establish(self): # This function fetches our json file to load all stored timings and alerts.
         data = st.send_to_disseminate() # Fetches our saved data we load at runtime.
@@ -113,8 +238,7 @@ class Controller():
         # From here we go through each piece of stored information and correspondingly write it to each module for use during each cycle.
         
         if data.get("alerts"):
-            self.posted_alerts = data["alerts"].copy()
-            aManager.write_to_alerts(data["alerts"].copy())         
+            aManager.write_to_alerts(data["alerts"]) # Fills alertStore, which both of us read from.
         
         if data.get("forecast"):
             fcast.write_forecast_states(data["forecast"])
@@ -131,28 +255,34 @@ class Controller():
         if data.get("stats"):
            alertStats.write_to_stats(data["stats"])
         
-        self.timeDelay = config.cycleTime
-    
-        if self.timeDelay < 30: self.timeDelay = 30 # This is hard-coded to prevent excessive requests to the api.weather.gov endpoint. 
-    
-        self.timeDelay = self.timeDelay/3
+    def save_info(self): # Hand what changed to the state writer. Copies, since it's written from another thread. Nothing here waits on disk.
+        sections = {}
+        
+        for name, source, provide in (
+            ("forecast", fcast, fcast.return_forecast_states),
+            ("hurricane", hurr, hurr.return_forecast_states),
+            ("timing", tManager, tManager.provide),
+            ("trackId", identifier, identifier.provide_next_id),
+            ("stats", alertStats, alertStats.provide_stats),
+        ):
+            if source.dirty:
+                sections[name] = copy.deepcopy(provide())
+                source.dirty = False
         
-    def save_info(self):
-        hInfo = hurr.return_forecast_states()
-        fInfo = fcast.return_forecast_states()
-        sInfo = alertStats.provide_stats()
-        tim = tManager.provide()
-        tID = identifier.provide_next_id()
+        changed, removed = alertStore.take_changes()
         
-        st.write_data(fInfo, hInfo, self.posted_alerts, tim, tID, sInfo)
+        if changed or removed:
+            sections["alerts"] = {"changed": changed, "removed": removed}
+        
+        st.write_data(sections)
         
     async def handle_and_post_outlooks(self):
-        to_post = OtlkHandler.check_outlook()
+        to_post = await OtlkHandler.check_outlook()
         
         if to_post:
             print("Preparing to post outlook information")
             for day, info in to_post.items():
-                buf = generate_outlook_image(info["geom"])
+                buf = await renderPool.outlook_image(info["geom"])
                 
                 embed = discord.Embed(
                     title=f"{day.capitalize()} Outlook Information",
@@ -170,7 +300,7 @@ class Controller():
                 
         
     async def handle_and_post_forecasts(self):
-        post, info = fcast.time_to_post_forecast()
+        post, info = await fcast.time_to_post_forecast()
         
         if post:
             
@@ -192,7 +322,8 @@ class Controller():
                 
             await self.post_to_channel(forecastWeb, embed)
             
-        post, image, discussion = hurr.time_to_post_hurricane()
+    async def handle_and_post_hurricane(self):
+        post, image, discussion = await hurr.time_to_post_hurricane()
         
         if post:
             
@@ -212,173 +343,189 @@ class Controller():
             
             await self.post_to_channel(hurricaneWeb, embed, url=new_url) 
     
-    def clean(self):
-        now = datetime.now(timezone.utc)
-        expired = []
-        for alert, info in self.posted_alerts.items():
-            if not info["expires"] or datetime.fromisoformat(info["expires"]) + timedelta(hours=24) < now:
-                expired.append(alert)
-
-        for alert in expired:
-            del self.posted_alerts[alert]
-    
     async def handle_and_post_alerts(self):
-        alertList = aManager.cycle() # Handling this cycle is the chunkiest thing in here I swear
+        await aManager.cycle() # Handling this cycle is the chunkiest thing in here I swear
         
-        if alertList is None: return
+        pending = sorted(alertStore.pending(), key=deter.priority, reverse=True) # Only what's new or still waiting to go out, most urgent first.
         
-        for a in alertList:
-            alrt = alertList[a]
-            Id = alrt["id"]
-            ignore = alrt.get("ignore", False)
+        if not pending: return
+        
+        alertList = {alrt["id"]: alrt for alrt in pending}
+        
+        waiting = [alrt for alrt in pending if not alrt.get("ignore", False) and alrt["id"] not in self.dispatching]
+        shed = len(waiting) + len(self.dispatching) >= config.alertShedBacklog # Backed up. Lower priority alerts go without a map so the render pool and uploads are left to warnings.
+        
+        renders = {} # Submit every render up front so they run in parallel across the pool while earlier alerts are posted. Most urgent first, so those come back first.
+        polygonAlerts = []
+        
+        for alrt in waiting:
+            if alrt.get("vtecAction") in CLOSE_ACTIONS and alertStore.messages_for(alrt["trackId"]): # Ends an event we posted. Its messages get a note, no map needed.
+                renders[alrt["id"]] = None
+            elif shed and deter.priority(alrt) < deter.urgentPriority:
+                log.info(f"Backlog of {len(waiting) + len(self.dispatching)} alerts, posting {alrt["id"]} without a map.")
+                renders[alrt["id"]] = None
+            else:
+                renders[alrt["id"]] = asyncio.ensure_future(renderPool.alert_image(alrt["coords"], alrt["base"], alrt["SAME_code"], alrt["polyColor"], alrt["trackId"], alrt["countiesAffected"]))
+                
+            if alrt["base"] == "Polygon":
+                polygonAlerts.append(alrt)
+        
+        try:
+            poiTargets = dict(zip((alrt["id"] for alrt in polygonAlerts), poiIndex.targets_many([alrt["coords"] for alrt in polygonAlerts], [alrt["countiesAffected"] for alrt in polygonAlerts]))) # One index query for every new polygon against every site.
             
-            if Id not in self.posted_alerts:
-                
-                if ignore:
-                    log.info(f"{Id} marked as ignored.")
-                    self.posted_alerts[Id] = alrt
-                    continue
-                
-                log.info(f"Working {Id}")
-                
-                severity = alrt.get("severity", "Unknown")
-                color = severity_colors.get(severity, 0x808080) # Determine color based on severity property.
-                
-                header = f"(#{alrt["trackId"]}) - {alrt["title"]}"
-                
-                header = (header[:256-4] + "...") if len (header) > 256 else header
-                
-                preambleList = [
-                    "WMOidentifier",
-                    "AWIPSidentifier",
-                    "VTEC",
-                    "space",
-                    "event",
-                    "senderName",
-                    "bulletin",
-                ]
-                
-                preamble_lines = []
+            for a in alertList:
+                alrt = alertList[a]
+                Id = alrt["id"]
+                ignore = alrt.get("ignore", False)
                 
-                for field in preambleList:
-                    if field == "space":
-                        preamble_lines.append("")  # adds a blank line
-                    elif field == "bulletin":
-                        bulletin = deter.determine(alrt["WEAHandling"], alrt["messageType"], alrt["severity"], alrt["certainty"], alrt["urgency"])
-                        if bulletin:
-                            preamble_lines.append(bulletin)
-                    elif alrt.get(field):
-                        preamble_lines.append(alrt[field])
-                        
-                preambleString = "\n".join(preamble_lines)
+                if not alrt["posted"] and Id not in self.dispatching:
+                    
+                    if ignore:
+                        log.info(f"{Id} marked as ignored.")
+                        alertStore.mark_posted(Id)
+                        continue
+                    
+                    log.info(f"Working {Id}")
+                    
+                    severity = alrt.get("severity", "Unknown")
+                    color = severity_colors.get(severity, 0x808080) # Determine color based on severity property.
+                    
+                    header = f"(#{alrt["trackId"]}) - {alrt["title"]}"
+                    
+                    header = (header[:256-4] + "...") if len (header) > 256 else header
+                    
+                    preambleList = [
+                        "WMOidentifier",
+                        "AWIPSidentifier",
+                        "VTEC",
+                        "space",
+                        "event",
+                        "senderName",
+                        "bulletin",
+                    ]
+                    
+                    preamble_lines = []
+                    
+                    for field in preambleList:
+                        if field == "space":
+                            preamble_lines.append("")  # adds a blank line
+                        elif field == "bulletin":
+                            bulletin = deter.determine(alrt["WEAHandling"], alrt["messageType"], alrt["severity"], alrt["certainty"], alrt["urgency"])
+                            if bulletin:
+                                preamble_lines.append(bulletin)
+                        elif alrt.get(field):
+                            preamble_lines.append(alrt[field])
                             
-                mainList = [
-                    "secondary_title",
-                    "desc",
-                ]
-                
-                main_lines = []
+                    preambleString = "\n".join(preamble_lines)
+                                
+                    mainList = [
+                        "secondary_title",
+                        "desc",
+                    ]
+                    
+                    main_lines = []
 
-                for field in mainList:
-                    if alrt.get(field):
-                        main_lines.append(alrt[field])
+                    for field in mainList:
+                        if alrt.get(field):
+                            main_lines.append(alrt[field])
 
-                mainString = "\n\n".join(main_lines)
-                
-                truncated_text = (mainString[:3850-3] + "...") if len(mainString) > 3850 else mainString
-                
-                truncated_text = re.sub(r'(?<!\n)\n(?!\n)', ' ', truncated_text) # Scrub text for single newlines and removes them, double new lines preserved.
-                
-                if alrt["eventMotionDescription"]:
-                    truncated_text = truncated_text + "\n\n" + alrt["eventMotionDescription"]
+                    mainString = "\n\n".join(main_lines)
                     
-                total = preambleString + "\n\n" + truncated_text
-                
-                informationToFetch = {
-                    "id": "Alert Id: ",
-                    "SAME_code": "SAME: ",
-                    "severity": "Severity: ",
-                    "urgency": "Urgency: ",
-                    "certainty": "Certainty: ",
-                    "response": "Response: ",
-                    "hailThreat": "Hail Threat: ",
-                    "maxHailSize": "Max Hail Size: ",
-                    "windThreat": "Wind Threat: ",
-                    "maxWindGust": "Max Wind Gust: ",
-                    "tornadoDetection": "Tornado Detection: ",
-                    "tornadoDamageThreat": "Damage Threat: ",
-                    "thunderstormDamageThreat": "Damage Threat: ",
-                }
-                
-                info_lines = []
-                
-                for key, lead in informationToFetch.items():
-                    if alrt.get(key):
-                        info_lines.append(lead + alrt.get(key))
+                    truncated_text = (mainString[:3850-3] + "...") if len(mainString) > 3850 else mainString
+                    
+                    truncated_text = re.sub(r'(?<!\n)\n(?!\n)', ' ', truncated_text) # Scrub text for single newlines and removes them, double new lines preserved.
+                    
+                    if alrt["eventMotionDescription"]:
+                        truncated_text = truncated_text + "\n\n" + alrt["eventMotionDescription"]
                         
-                infoMessage = "\n".join(info_lines)
-                
-                embed = discord.Embed(
-                    title=header,
-                    description=total,
-                    color=color,
-                )
-                
-                if alrt["instruction"]:
-                    instruction_text = re.sub(r'(?<!\n)\n(?!\n)', ' ', alrt["instruction"])
+                    total = preambleString + "\n\n" + truncated_text
                     
-                    embed.add_field(name="Precautionary/Preparedness Instructions", value=instruction_text, inline=False)
+                    informationToFetch = {
+                        "id": "Alert Id: ",
+                        "SAME_code": "SAME: ",
+                        "severity": "Severity: ",
+                        "urgency": "Urgency: ",
+                        "certainty": "Certainty: ",
+                        "response": "Response: ",
+                        "hailThreat": "Hail Threat: ",
+                        "maxHailSize": "Max Hail Size: ",
+                        "windThreat": "Wind Threat: ",
+                        "maxWindGust": "Max Wind Gust: ",
+                        "tornadoDetection": "Tornado Detection: ",
+                        "tornadoDamageThreat": "Damage Threat: ",
+                        "thunderstormDamageThreat": "Damage Threat: ",
+                    }
                     
-                embed.add_field(name="Alert Information", value=infoMessage, inline=False)
-                embed.set_footer(text=config.VERSION)
-                
-                buf = generate_alert_image(alrt["coords"], alrt["base"], alrt["SAME_code"], alrt["polyColor"], alrt["trackId"], alrt["countiesAffected"])
-                
-                embed.set_image(url="attachment://alert_map.png")
-                
-                posted_successfully = False
-                
-                for c in alrt["countiesAffected"]:
-                    channel = channels.get_channel_from_county(c)
+                    info_lines = []
+                    
+                    for key, lead in informationToFetch.items():
+                        if alrt.get(key):
+                            info_lines.append(lead + alrt.get(key))
+                            
+                    infoMessage = "\n".join(info_lines)
+                    
+                    embed = discord.Embed(
+                        title=header,
+                        description=total,
+                        color=color,
+                    )
                     
-                    if channel:
-                        log.info("webhook found")
-                        if alrt["SAME_code"] in config.alertCodes and alrt["status"] == "Actual":
-                            ping = config.pings[c]
-                            await self.post_to_channel(channel=channel, embed=ping)
-                        scs = await self.post_to_channel(channel=channel, embed=embed, buf=buf)
-                        if scs:
-                            posted_successfully = True
-                    if c == "orange" and alrt["base"] == "Area" and channel:
-                        channel = channels.get_channel_from_county("arc")
+                    if alrt["instruction"]:
+                        instruction_text = re.sub(r'(?<!\n)\n(?!\n)', ' ', alrt["instruction"])
                         
-                        if alrt["SAME_code"] in config.alertCodes and alrt["status"] == "Actual":
-                            ping = config.pings["arc"]
-                            await self.post_to_channel(channel=channel, embed=ping)
-                        scs = await self.post_to_channel(channel=channel, embed=embed, buf=buf)
-                        if scs:
-                            posted_successfully = True
-                    elif (c == "orange" or c == "seminole") and alrt["base"] == "Polygon":
-                        ucfAffected = ucf_in_or_near_polygon(alrt["coords"])
+                        embed.add_field(name="Precautionary/Preparedness Instructions", value=instruction_text, inline=False)
                         
-                        if ucfAffected:
-                            channel = channels.get_channel_from_county("arc")
+                    embed.add_field(name="Alert Information", value=infoMessage, inline=False)
+                    embed.set_footer(text=config.VERSION)
+                    
+                    buf = await renders[Id] if renders[Id] else None
+                    
+                    if buf:
+                        embed.set_image(url="attachment://alert_map.png")
+                    
+                    targets = [] # (channel, key) pairs this alert goes to.
+                    postedTo = [] # Channel keys this alert has gone to, so a site route doesn't post it twice.
+                    
+                    for c in alrt["countiesAffected"]:
+                        channel = channels.get_channel_from_county(c)
+                        
+                        if channel:
+                            log.info("webhook found")
+                            targets.append((channel, c))
+                            postedTo.append(c)
+                        if c == "orange" and alrt["base"] == "Area" and channel:
+                            arcChannel = channels.get_channel_from_county("arc")
+                            
+                            if arcChannel:
+                                targets.append((arcChannel, "arc"))
+                                postedTo.append("arc")
+                            
+                    for target in poiTargets.get(Id, []): # Polygon alerts that come near a registered site go to that site's channel.
+                        channel = channels.get_channel_from_county(target)
                         
-                            if alrt["SAME_code"] in config.alertCodes and alrt["status"] == "Actual":
-                                if alrt["SAME_code"] in config.alertCodes:
-                                    ping = config.pings["arc"]
-                                    await self.post_to_channel(channel=channel, embed=ping)
-                            scs = await self.post_to_channel(channel=channel, embed=embed, buf=buf)
-                            if scs:
-                                posted_successfully = True
+                        if target in postedTo or not channel: continue
+                        
+                        targets.append((channel, target))
+                        postedTo.append(target)
                     
-                if posted_successfully == True:
-                    self.posted_alerts[Id] = alrt
-                    alertStats.add_stat(alrt["countiesAffected"], alrt["SAME_code"])
-                    log.info(f"✅🔗 Alert pushed.")
-                    log.info("Sent " + Id)
-                
-                await asyncio.sleep(5)
+                    action = alrt.get("vtecAction")
+                    edits = {}
+                    note = None
+                    
+                    if action in EDIT_ACTIONS | CLOSE_ACTIONS or (alrt.get("Replacement") and not alrt.get("vtecKeys")): # Same event as something already posted, change those messages.
+                        edits = alertStore.messages_for(alrt["trackId"])
+                        
+                    if action in CLOSE_ACTIONS:
+                        note = header[:2000]
+                        
+                    if edits:
+                        log.info(f"Editing {len(edits)} existing messages of track #{alrt["trackId"]} ({action or "replacement"}).")
+                    
+                    # Queued, not awaited. The next alert is built while this one goes out, and it's marked posted once it has.
+                    self.dispatching[Id] = asyncio.create_task(self.finish_alert(alrt, targets, self.deliver(alrt, embed, buf, targets, edits, note)))
+        finally: # Anything not awaited by now, because of an exception along the way, shouldn't keep a worker busy.
+            for render in renders.values():
+                if render and not render.done(): render.cancel()
                         
                 
                 
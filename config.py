@@ -39,10 +39,38 @@ channels = {
     "marine": 1418717338395480136,
 }
 
-cycleTime = 75 # How much time, in seconds, should the cycle last?
-# Cycle is split by two periods, each period occurring after half of the "cycleTime" has elapsed.
+cycleTime = 75 # Time, in seconds, between alert polls when nothing dangerous is going on. See the alertPoll settings below.
+# Forecasts, hurricane discussions and outlooks run on their own posting windows, not on this cycle.
 bufferMiles = 3 # How many miles does an alert need to be within UCF for it to issue to ARC alerts?
+pointsOfInterest = { # Sites polygon alerts are routed for. An alert whose polygon comes within bufferMiles of a site posts to its target channel.
+    "UCF": {"coords": (28.6024, -81.2001), "bufferMiles": bufferMiles, "target": "arc", "counties": ("orange", "seminole")},
+    "UCF Downtown": {"coords": (28.5470, -81.3867), "bufferMiles": 1, "target": "arc", "counties": ("orange", "seminole")},
+    "Rosen College": {"coords": (28.4290, -81.4422), "bufferMiles": 1, "target": "arc", "counties": ("orange", "seminole")},
+    "UCF Lake Nona": {"coords": (28.3680, -81.2800), "bufferMiles": 1, "target": "arc", "counties": ("orange", "seminole")},
+}
+cityPointBufferMiles = 0 # Buffer, in miles, for the cities in reference_locations. They are indexed alongside the sites above.
+cityPointTargets = {} # Route alerts touching a reference city to a channel, ex. {"Titusville": "brevard"}. Cities not listed aren't routed.
 storageTime = 18 # Time, in hours, to store alerts after they are issued.
+httpTimeout = 20 # Time, in seconds, a single request to an upstream feed may take in total before it is abandoned.
+httpConnectTimeout = 5 # Time, in seconds, allowed for opening a connection.
+httpKeepAlive = 60 # Time, in seconds, an idle pooled connection is kept open for reuse.
+httpMaxConnections = 20 # Total pooled connections shared by every service.
+httpConnectionsPerHost = 6 # Pooled connections allowed per host (api.weather.gov, spc.noaa.gov, nhc.noaa.gov).
+httpCacheEntries = 256 # Upstream responses kept for conditional requests (ETag / Last-Modified / max-age).
+zoneCacheHours = 24 # Time, in hours, compiled zones and zone geometry are trusted before they are refreshed in the background.
+zoneFetchConcurrency = 8 # Zone requests allowed in flight at once while compiling zone geometry.
+zoneFetchRetries = 3 # Retries per zone request before that zone is skipped.
+zoneFetchBackoff = 1.0 # Seconds before the first retry, doubling on each attempt after.
+renderWorkers = 2 # Worker processes used to render alert and outlook maps. Each holds its own copy of the map layers.
+uploadImageOnce = True # Upload each alert map once, then point the other channels' embeds at that attachment's url.
+alertDetailConcurrency = 4 # Alert detail requests allowed in flight at once.
+alertPollFloor = 30 # Time, in seconds, between alert polls while a TOR/SVR/FFW is active here or the Day 1 outlook is at alertPollOutlookRisk. 30 is the lowest allowed.
+alertPollOutlookRisk = "ENH" # Day 1 category over a monitored county (MRGL, SLGT, ENH, MDT, HIGH) that keeps alert polling at the floor.
+alertPollBackoff = 1.5 # When quiet, each poll that brings nothing new stretches the interval (starting at cycleTime) by this factor.
+alertPollQuiet = 300 # Longest time, in seconds, between alert polls on a quiet day.
+outlookRiskRefresh = 900 # Time, in seconds, between checks of the Day 1 outlook for the alert poll rate.
+stateWriteDelay = 2 # Time, in seconds, the state writer waits after a change so a burst of saves lands as one write.
+alertShedBacklog = 6 # Alerts waiting to go out at which lower priority ones are posted without a map, so warnings aren't held up by renders.
 VERSION = "v2.2.4"
 AUTHOR = "ARC ALERTS @ UCF"
 
@@ -1,13 +1,19 @@
 from .alerts import alerts
+from .alert_record import Alert
+from .alert_store import alertStore
 from .forecast import Forecasts
 from .hurricane import Hurricane
+from .outlook_info import OtlkHandler
 from .state import State
 from .stats import AlertStatistics
 
 __all__ = [
     "alerts",
+    "Alert",
+    "alertStore",
     "Forecasts",
     "Hurricane",
+    "OtlkHandler",
     "State",
     "AlertStatistics",
 ]
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+
+'''
+One alert, as compiled from the active feed. Slotted, so the 40-odd fields cost a pointer each instead of a dict entry,
+and the same object is shared by Alerts and the Controller through alertStore.
+It still reads like the dicts it replaced (alert["title"], alert.get("VTEC"), "trackId" in alert) so the services didn't have to change shape.
+
+coords are the heaviest part of an alert. They are kept as compact json text and only decoded when someone asks for them,
+which is once when the map is rendered and once for routing. to_dict hands the text straight back, so saving never re-encodes them.
+'''
+
+MISSING = object()
+
+FIELDS = (
+    "id",
+    "sent",
+    "expires",
+    "title",
+    "secondary_title",
+    "areaDesc",
+    "desc",
+    "instruction",
+    "messageType",
+    "SAME_code",
+    "NWS_code",
+    "status",
+    "certainty",
+    "severity",
+    "urgency",
+    "senderName",
+    "response",
+    "event",
+    "coords",
+    "base",
+    "countiesAffected",
+    "references",
+    "replacedBy",
+    "replacedAt",
+    "ignore",
+    "posted", # Went out to Discord (or was ignored), kept in the save file so restarts don't post again.
+    "messages", # Channel id -> Discord message id this alert was posted or edited into.
+    "vtecKeys",
+    "vtecAction",
+    "polyColor",
+    "trackId",
+    "Replacement",
+    "Referenced",
+    "hailThreat", # Parameters, see param_keys in services/alerts.py.
+    "windThreat",
+    "maxWindGust",
+    "maxHailSize",
+    "tornadoDamageThreat",
+    "thunderstormDamageThreat",
+    "flashfloodDamageThreat",
+    "WEAHandling",
+    "tornadoDetection",
+    "BLOCKCHANNEL",
+    "VTEC",
+    "AWIPSidentifier",
+    "WMOidentifier",
+    "eventMotionDescription",
+    "expiredReferences",
+)
+
+FIELD_SET = frozenset(FIELDS)
+
+class Alert():
+    __slots__ = tuple(f for f in FIELDS if f != "coords") + ("_coords",)
+
+    id: str
+    sent: str
+    expires: str
+    title: str
+    desc: str
+    SAME_code: str
+    base: str # "Polygon" or "Area", tells the renderer what coords hold.
+    countiesAffected: list
+    references: list
+    ignore: bool
+    vtecKeys: list
+    polyColor: str
+    trackId: int
+
+    def __init__(self, **fields):
+        self._coords = None
+        self.update(fields)
+
+    @property
+    def coords(self): # Decoded on every access, callers hold on to the result if they need it twice.
+        return json.loads(self._coords) if self._coords is not None else None
+
+    @coords.setter
+    def coords(self, value):
+        if value is None or isinstance(value, str):
+            self._coords = value # Already json, ex. straight from the save file.
+        else:
+            self._coords = json.dumps(value, separators=(",", ":"))
+
+    def __getitem__(self, key: str):
+        if key not in FIELD_SET:
+            raise KeyError(key)
+
+        value = getattr(self, key, MISSING)
+
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key not in FIELD_SET:
+            raise KeyError(f"Alert has no field {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in FIELD_SET and getattr(self, key, MISSING) is not MISSING
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, fields: dict = None, **kwargs):
+        for source in (fields or {}, kwargs):
+            for key, value in source.items():
+                self[key] = value
+
+    def to_dict(self) -> dict: # Plain dict for the save file. coords stay json text.
+        data = {}
+
+        for key in FIELDS:
+            value = self._coords if key == "coords" else getattr(self, key, MISSING)
+
+            if value is not MISSING:
+                data[key] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Alert": # Accepts both the save file's json-text coords and plain lists.
+        return cls(**{k: v for k, v in data.items() if k in FIELD_SET})
+
+    def __repr__(self):
+        return f"Alert({self.get("id")!r}, trackId={self.get("trackId")!r})"
@@ -0,0 +1,147 @@
+import heapq
+from datetime import datetime, timezone
+from services.alert_record import Alert
+from config import storageTime
+
+'''
+The one place alert records live. Alerts (tracking) and the Controller (posting) both work off this store,
+each record carries its own flags: it's active while it's in here, posted once it went out, ignored when it never should.
+Expiry is decided here as well, from a deadline parsed once when the record is added. Deadlines sit in a min-heap,
+so a clean up only touches the alerts that are actually due. Removing or re-adding a record leaves its old heap entry
+behind; deadlines is the truth and stale entries are skipped when they surface.
+Records changed or removed since the last save are tracked too, so a save only carries those.
+Each record keeps the Discord messages it went out in. They're indexed by track id as well, so a later alert of the same
+track can edit those messages instead of posting new ones. The index is rebuilt from the records on load, nothing extra is saved.
+'''
+
+class AlertStore():
+    def __init__(self):
+        self.records = {} # id -> Alert. Every alert we know of, there is no other copy.
+        self.deadlines = {} # id -> epoch seconds after which the record is dropped (expires + storageTime).
+        self.expiryHeap = [] # (deadline, id), soonest first. May hold stale entries, see above.
+        self.pendingIds = {} # Ids not posted yet, in the order they arrived. A dict so it stays ordered.
+        self.dirtyIds = set() # Added or changed since the last save.
+        self.removedIds = set() # Removed since the last save.
+        self.trackIds = {} # trackId -> ids of stored records on that track.
+        self.trackMessages = {} # trackId -> {channel id: message id} of the track's latest messages.
+
+    def __contains__(self, aid: str) -> bool:
+        return aid in self.records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, aid: str) -> Alert | None:
+        return self.records.get(aid)
+
+    def add(self, alert: Alert):
+        aid = alert["id"]
+        expires = alert.get("expires")
+
+        deadline = datetime.fromisoformat(expires).timestamp() + storageTime * 3600 if expires else float("-inf") # Expireless alerts go on the next clean up.
+
+        self.records[aid] = alert
+        self.touch(aid)
+        
+        if alert.get("trackId") is not None:
+            self.trackIds.setdefault(alert["trackId"], set()).add(aid)
+            
+            if alert.get("messages"):
+                self.trackMessages.setdefault(alert["trackId"], {}).update(alert["messages"])
+
+        if self.deadlines.get(aid) != deadline:
+            self.deadlines[aid] = deadline
+            heapq.heappush(self.expiryHeap, (deadline, aid))
+
+            if len(self.expiryHeap) > 2 * len(self.deadlines) + 64: # Mostly stale, rebuild from the live deadlines.
+                self.expiryHeap = [(d, i) for i, d in self.deadlines.items()]
+                heapq.heapify(self.expiryHeap)
+
+        if alert.get("posted"):
+            self.pendingIds.pop(aid, None)
+        else:
+            self.pendingIds[aid] = None
+
+    def remove(self, aid: str) -> Alert:
+        self.deadlines.pop(aid, None)
+        self.pendingIds.pop(aid, None)
+        self.dirtyIds.discard(aid)
+        self.removedIds.add(aid)
+        
+        alert = self.records.pop(aid)
+        holders = self.trackIds.get(alert.get("trackId"))
+        
+        if holders is not None:
+            holders.discard(aid)
+            
+            if not holders: # Last record of the track, nothing is left to edit its messages.
+                del self.trackIds[alert["trackId"]]
+                self.trackMessages.pop(alert["trackId"], None)
+
+        return alert
+
+    def clear(self):
+        self.removedIds.update(self.records)
+        self.dirtyIds.clear()
+        self.records.clear()
+        self.deadlines.clear()
+        self.expiryHeap.clear()
+        self.pendingIds.clear()
+        self.trackIds.clear()
+        self.trackMessages.clear()
+
+    def mark_posted(self, aid: str):
+        self.records[aid]["posted"] = True
+        self.pendingIds.pop(aid, None)
+        self.touch(aid)
+
+    def record_messages(self, aid: str, messages: dict): # Channel id -> message id the alert now lives in, new posts and edits alike.
+        alert = self.records[aid]
+        alert["messages"] = {**(alert.get("messages") or {}), **messages}
+        self.trackMessages.setdefault(alert["trackId"], {}).update(messages)
+        self.touch(aid)
+
+    def messages_for(self, trackId) -> dict: # Channel id -> message id already holding this track.
+        return self.trackMessages.get(trackId, {})
+
+    def touch(self, aid: str): # A record changed outside of add, ex. its lineage was updated.
+        self.dirtyIds.add(aid)
+        self.removedIds.discard(aid)
+
+    def mark_clean(self): # What's in memory matches what's saved, ex. right after loading.
+        self.dirtyIds.clear()
+        self.removedIds.clear()
+
+    def take_changes(self) -> tuple[dict, list]: # (id -> save form of changed records, removed ids), and start tracking afresh.
+        changed = {aid: self.records[aid].to_dict() for aid in self.dirtyIds}
+        removed = list(self.removedIds)
+        self.mark_clean()
+
+        return changed, removed
+
+    def pending(self) -> list: # Not posted yet, oldest first.
+        return [self.records[aid] for aid in self.pendingIds]
+
+    def posted(self) -> list:
+        return [alert for alert in self.records.values() if alert.get("posted")]
+
+    def ignored(self) -> list:
+        return [alert for alert in self.records.values() if alert.get("ignore")]
+
+    def due(self, now: datetime | None = None) -> list: # Ids past their deadline. They come off the heap, the caller is expected to remove them.
+        now = (now or datetime.now(timezone.utc)).timestamp()
+        due = []
+
+        while self.expiryHeap and self.expiryHeap[0][0] < now:
+            deadline, aid = heapq.heappop(self.expiryHeap)
+
+            if self.deadlines.get(aid) == deadline: # Skip entries left behind by a remove or a new deadline.
+                del self.deadlines[aid] # A duplicate entry for the same deadline won't match again.
+                due.append(aid)
+
+        return due
+
+    def to_dict(self) -> dict: # Save file form.
+        return {aid: alert.to_dict() for aid, alert in self.records.items()}
+
+alertStore = AlertStore()
@@ -1,13 +1,14 @@
-from utils import zoneManager, identifier
+from utils import zoneManager, identifier, httpClient, alertDetails
+from utils.similarity import SimilarityIndex
+from utils.vtec import parse_vtec, primary_vtec
 from services.syslogger import log
+from services.alert_record import Alert
+from services.alert_store import alertStore
 import difflib
-import requests
-import os
-from dotenv import load_dotenv
 import datetime
 from datetime import datetime, timezone, timedelta, time
-from config import polygon_colors_SAME, storageTime
-load_dotenv('../sensitive.env')
+from config import polygon_colors_SAME
+import config
 
 IGNORE_LIST = [
     "SVR",
@@ -18,27 +19,65 @@ IGNORE_LIST = [
     "SPS",
 ]
 
+THREAT_CODES = { # While any of these are active in our area, alerts are polled at the floor.
+    "TOR",
+    "SVR",
+    "FFW",
+}
+
+SIMILARITY_FULL_SCAN = 100 # Up to this many stored alerts, similarity compares against all of them. The index is only used past that.
+
+POLL_FLOOR = 30 # Never poll api.weather.gov more often than this, whatever the config says.
+
+ACTIVE_URL = "https://api.weather.gov/alerts/active?area=FL"
+
 zones = zoneManager
 
+class AlertChanges(): # What one cycle brought in. A quiet cycle is what backs the poll off.
+    __slots__ = ("added", "updated")
+    
+    def __init__(self):
+        self.added = [] # Alerts stored for the first time this cycle.
+        self.updated = [] # Stored alerts re-sent under the same id (new sent time).
+        
+    def __bool__(self):
+        return bool(self.added or self.updated)
+
 class Alerts():
     
     def __init__(self): # Initalize
-        self.requestHeader = {"User-Agent": os.environ.get('HEADER')}
         self.initialized = True
-        self.ActiveAlerts = {}
+        self.store = alertStore # Shared with the Controller, holds the only copy of each alert.
+        self.similarity = SimilarityIndex() # Shingle index over every active alert's title and description.
+        self.replacedByIndex = {} # replacedBy id -> stored alert ids it replaces.
+        self.referenceIndex = {} # referenced id -> stored alert ids that reference it.
+        self.feedLineage = None # id -> replacedBy/replacedAt/references for every product in the last active feed. None until a poll succeeds.
+        self.feedReferenced = {} # Id referenced by some product in the last active feed -> (that product's id, its sent time).
+        self.detailChecked = set() # Stored alerts already fetched once after leaving the feed.
+        self.eventIndex = {} # VTEC event key (office.phenomena.significance.etn.year) -> latest stored alert of that event.
+        self.threatIds = set() # Stored alerts with a THREAT_CODES SAME code.
+        self.quietPolls = 0 # Polls in a row that brought nothing new, drives the back off.
         log.info("Alerts SERIVCE initialized.")
         
+    @property
+    def ActiveAlerts(self) -> dict: # Every stored alert, id -> Alert. Changes go through _add_active / _remove_active.
+        return self.store.records
+    
     def normalize(self, text: str) -> str:
-        return text.lower().strip()
+        return (text or "").lower().strip()
+    
+    def _similarity_text(self, alert: dict) -> str:
+        return self.normalize(alert["title"]) + "\n" + self.normalize(alert["desc"])
         
-    def cycle(self) -> dict: # Public function called for the function to cycle.
+    async def cycle(self) -> AlertChanges: # Public function called for the function to cycle.
         log.info("Cycling")
-        self._clean_up() # Clean up
+        changes = AlertChanges()
+        removed = self._clean_up() # Clean up
         # Best to do this first to avoid posting alerts that are no longer active.
         
-        aList = self._retrieve_alerts_and_organize() # Fetch alerts
+        aList = await self._retrieve_alerts_and_organize() # Fetch alerts, only the ones that are new or were re-sent.
         
-        if aList:
+        if aList is not None:
             for alert in aList: # Begin checking alerts.
                 polyColor = '#6e6e6e'
                 
@@ -51,8 +90,31 @@ class Alerts():
                 
                 log.info(f"Checking {alert["id"]} for existence in active alerts.")
                 
-                if alert["id"] not in self.ActiveAlerts: # If we don't have the alert, add it.
-                    replacement, ref, Type = self._check_for_replacement(alert)
+                if alert["id"] in self.ActiveAlerts: # Same product, sent again.
+                    self._refresh_active(alert)
+                    changes.updated.append(alert)
+                    continue
+                
+                if alert["vtecKeys"]: # VTEC products: the event key decides continuity.
+                    event = self._find_event(alert)
+                    
+                    if event:
+                        log.info(f"Alert continues VTEC event of {event} ({alert["vtecAction"]}).")
+                        alert["trackId"] = self.ActiveAlerts[event]["trackId"]
+                        alert["polyColor"] = self.ActiveAlerts[event]["polyColor"]
+                        alert["Replacement"] = True
+                        
+                        if alert["SAME_code"] not in IGNORE_LIST and self._is_similar(alert, event):
+                            alert["ignore"] = True
+                    else:
+                        alert["trackId"] = identifier.issue_identifier()
+                        log.info(f"New VTEC event, track Identifier added, {alert["trackId"]}")
+                        
+                    self._add_active(alert)
+                    changes.added.append(alert)
+                    
+                else: # No VTEC, piece continuity together from references and text.
+                    replacement, ref, Type = await self._check_for_replacement(alert)
                     
                     if replacement and ref in self.ActiveAlerts and Type == "replaced":
                         log.info("Alert is a replacement.")
@@ -79,82 +141,198 @@ class Alerts():
                         
                     log.info(f"{alert["id"]} adding to active alerts.")
                         
-                    self.ActiveAlerts[alert["id"]] = alert
+                    self._add_active(alert)
+                    changes.added.append(alert)
         else: 
             log.warn("no alert list compiled. This may be an error, check internals.")
                     
-        log.info("Complete: returning activealerts")
-        return self.ActiveAlerts
+        if changes.added or changes.updated:
+            self.quietPolls = 0
+        elif config.alertPollBackoff > 1 and self._quiet_delay() < config.alertPollQuiet: # Once at alertPollQuiet the interval can't stretch further, stop counting.
+            self.quietPolls += 1
+        
+        log.info(f"Complete: {len(changes.added)} added, {len(changes.updated)} updated, {len(removed)} removed.")
+        return changes
     
-    def _check_for_replacement(self, alert: dict) -> tuple[bool, str]:
-        log.info("checking replacements")
+    def threat_active(self) -> bool: # A TOR/SVR/FFW for our area that hasn't expired yet.
+        now = datetime.now(timezone.utc)
         
-        for key, info in self.ActiveAlerts.items():
-            refs = info.get("references", "")
-            replacedBy = info.get("replacedBy", "")
+        for aid in self.threatIds:
+            expires = self.ActiveAlerts[aid].get("expires")
             
-            if replacedBy:
-                if replacedBy == alert["id"]:
-                    log.info(f"{alert["id"]} is a replacement of {key}")
-                    return True, key, "replaced"
-                
-            if refs:
-                for r in refs:
-                    if r["@id"] == alert["id"]:
-                        log.info(f"{alert["id"]} is referenced in {key}")
-                        return True, key, "referenced" 
+            if expires and datetime.fromisoformat(expires) > now:
+                return True
+        return False
+    
+    def next_poll_delay(self, elevated: bool = False) -> float:
+        '''
+        Seconds until the next poll. The floor while a threat is active or the outlook is elevated, otherwise cycleTime
+        stretched by alertPollBackoff for every quiet poll, up to alertPollQuiet. Never sooner than the feed's Cache-Control
+        says it stays fresh, or than a Retry-After asked for.
+        '''
+        floor = max(POLL_FLOOR, config.alertPollFloor)
         
-        references = alert.get("references", None)
+        if elevated or self.threat_active():
+            delay = floor
+        else:
+            delay = self._quiet_delay()
+            
+        return max(floor, delay, httpClient.fresh_for(ACTIVE_URL), httpClient.retry_after(ACTIVE_URL))
+    
+    def _quiet_delay(self) -> float: # cycleTime stretched by alertPollBackoff once per quiet poll, up to alertPollQuiet. Never a huge power.
+        delay = config.cycleTime
         
-        if references:
-            for ref in references:
-                refId = ref["@id"]
+        for _ in range(self.quietPolls):
+            if delay >= config.alertPollQuiet: break
+            delay *= config.alertPollBackoff
             
-                if refId and refId in self.ActiveAlerts:
-                    compareAlert = self.ActiveAlerts[refId]
+        return min(delay, config.alertPollQuiet)
+    
+    async def _check_for_replacement(self, alert: dict) -> tuple[bool, str, str]:
+        log.info("checking replacements")
+        aid = alert["id"]
+        
+        replaced = self.replacedByIndex.get(aid) # Stored alerts naming this one as their replacement.
+        
+        if replaced:
+            log.info(f"{aid} is a replacement of {replaced[0]}")
+            return True, replaced[0], "replaced"
+        
+        referrers = self.referenceIndex.get(aid) # Stored alerts referencing this one.
+        
+        if referrers:
+            log.info(f"{aid} is referenced in {referrers[0]}")
+            return True, referrers[0], "referenced"
+        
+        refIds = [ref["@id"] for ref in alert.get("references") or [] if ref.get("@id")]
+        
+        for refId in refIds: # Products we already have, no request needed.
+            if refId in self.ActiveAlerts:
+                if self.ActiveAlerts[refId].get("replacedBy") == aid:
+                    log.info("Alert Id matches replacement id for another alert.")
+                    return True, refId, "replaced"
                 
-                    replacedBy = compareAlert.get("replacedBy", "")
+                return True, refId, "referenced"
+        
+        feed = self.feedLineage or {}
+        details = await alertDetails.get_many([refId for refId in refIds if refId not in feed]) # Feed first, a request only for products that already left it.
+        
+        for refId in refIds: # Products we never stored. Their own references can still lead back to one we have.
+            props = feed.get(refId) or (details.get(refId) or {}).get("properties")
+            
+            if props:
+                for ref in props.get("references") or []:
+                    if ref.get("@id") in self.ActiveAlerts:
+                        log.info(f"{aid} references {ref["@id"]} through {refId}.")
+                        return True, ref["@id"], "referenced"
+        
+        log.info("Referenced alerts are not recorded.")
+        
+        return False, None, None
+    
+    def _add_active(self, alert: dict): # Every insert into ActiveAlerts goes through here so the indexes stay in step.
+        self.store.add(alert)
+        self.similarity.add(alert["id"], self._similarity_text(alert))
+        self._index_lineage(alert["id"], alert)
+        
+        for key in self._event_keys(alert):
+            self.eventIndex[key] = alert["id"] # Latest product of the event wins.
+            
+        if alert.get("SAME_code") in THREAT_CODES: self.threatIds.add(alert["id"])
+        
+    def _remove_active(self, aid: str):
+        info = self.store.remove(aid)
+        self.similarity.remove(aid)
+        self._unindex_lineage(aid, info)
+        
+        for key in self._event_keys(info):
+            if self.eventIndex.get(key) == aid: del self.eventIndex[key]
+            
+        self.threatIds.discard(aid)
+            
+    def _refresh_active(self, alert: dict): # Swap in the re-sent copy, keeping what we decided about the original.
+        stored = self.ActiveAlerts[alert["id"]]
+        
+        for key in ("trackId", "polyColor", "ignore", "posted", "messages", "Replacement", "Referenced"):
+            if key in stored: alert[key] = stored[key]
+            
+        self._remove_active(alert["id"])
+        self._add_active(alert)
+        
+    def _event_keys(self, info: dict) -> list:
+        if "vtecKeys" not in info: # Stored before VTEC was parsed, work it out from the raw string.
+            info["vtecKeys"] = [v.key for v in parse_vtec(info.get("VTEC"), info.get("sent", "")) if v.product == "O"]
+        return info["vtecKeys"]
+    
+    def _resolve_event_keys(self, vtecs: list, references) -> list:
+        '''
+        Event keys of a product's operational VTEC strings. An event already in effect has no begin time, so the year
+        parse_vtec gave it is a guess, and a CON sent in January for a December event would get the new year.
+        Its year is taken from the products it references first, then from a stored event of this year or the last.
+        '''
+        refKeys = [key for ref in references or [] if ref.get("@id") in self.ActiveAlerts for key in self._event_keys(self.ActiveAlerts[ref["@id"]])]
+        keys = []
+        
+        for v in vtecs:
+            if v.product != "O": continue
+            
+            key = v.key
+            
+            if v.in_effect:
+                known = [k for k in refKeys if k.rsplit(".", 1)[0] == v.event]
+                known += [f"{v.event}.{year}" for year in (v.year, v.year - 1) if f"{v.event}.{year}" in self.eventIndex]
                 
-                    if replacedBy is not None:
-                        if replacedBy == alert["id"]:
-                            log.info("Alert Id matches replacement id for another alert.")
-                            return True, refId, "replaced"
+                if known: key = known[0]
                 
-                    return True, refId, "referenced"
+            keys.append(key)
             
-                info = self._poll_internal_alerts(refId)
+        return keys
+        
+    def _find_event(self, alert: dict) -> str | None: # Stored alert of the same event, if any.
+        for key in alert["vtecKeys"]:
+            if self.eventIndex.get(key) in self.ActiveAlerts:
+                return self.eventIndex[key]
+        return None
+        
+    def _index_lineage(self, aid: str, info: dict):
+        replacedBy = info.get("replacedBy")
+        
+        if replacedBy:
+            self.replacedByIndex.setdefault(replacedBy, []).append(aid)
             
-                if info and info["properties"]:
-                    props = info["properties"]
+        for ref in info.get("references") or []:
+            if ref.get("@id"):
+                self.referenceIndex.setdefault(ref["@id"], []).append(aid)
                 
-                    replacedBy = props.get("replacedBy", "")
-                    replacedAt = props.get("replacedAt", "")
-                    rRefs = props.get("references", None)
-                
-                    if replacedBy:
-                        if refId and refId in self.ActiveAlerts:
-                            self.ActiveAlerts[refId]["replacedBy"] = replacedBy
-                            self.ActiveAlerts[refId]["replacedAt"] = replacedAt
-                    
-                        if replacedBy == alert["id"] and replacedBy in self.ActiveAlerts:
-                            log.info("Alert Id matches replacement id for another alert.")
-                            return True, refId, "replaced"
-                    else:
-                        return True, refId, "referenced"
+    def _unindex_lineage(self, aid: str, info: dict):
+        keyed = [(self.replacedByIndex, info.get("replacedBy"))]
+        keyed += [(self.referenceIndex, ref.get("@id")) for ref in info.get("references") or []]
         
-        log.info("Referenced alerts are not recorded.")
+        for index, key in keyed:
+            holders = index.get(key)
+            
+            if not holders or aid not in holders: continue
+            
+            holders.remove(aid)
+            
+            if not holders: del index[key]
+            
+    def _update_lineage(self, aid: str, **fields): # Change replacedBy / replacedAt / references on a stored alert and re-index it.
+        info = self.ActiveAlerts[aid]
         
-        return False, None, None
+        self._unindex_lineage(aid, info)
+        info.update(fields)
+        self._index_lineage(aid, info)
+        self.store.touch(aid)
         
-    def _clean_up(self): # Clean up our alerts; remove expired alerts or alerts which are expireless.
+    def _clean_up(self) -> list: # Clean up our alerts; remove expired alerts or alerts which are expireless. Returns the removed ids.
         log.info("Cleaning")
-        now = datetime.now(timezone.utc)
-        for aid, data in list(self.ActiveAlerts.items()):
-            expires = data.get("expires")
-            if not expires or datetime.fromisoformat(expires) + timedelta(hours=storageTime) < now:
-                del self.ActiveAlerts[aid]
+        removed = self.store.due()
+        for aid in removed:
+            self._remove_active(aid)
+        return removed
         
-    def _retrieve_alerts_and_organize(self) -> list:
+    async def _retrieve_alerts_and_organize(self) -> list:
         log.info("Retrieving alerts.")
         compiled_alerts = []
         def first_or_empty(lst): # Helper function for condensing code. Returns important information.
@@ -162,14 +340,22 @@ class Alerts():
         
         if not self.initialized: 
             raise RuntimeError("System not initialized!") # Why haven't you initialized???
-        alerts = self._poll_active_alerts() # Poll active alerts from API.
+        alerts = await self._poll_active_alerts() # Poll active alerts from API.
         
-        if not alerts: log.warn ("No alerts found."); return None # Gate; return if no alerts exist.
+        if not alerts: log.warn ("No alerts found."); self.feedLineage = None; return None # Gate; return if no alerts exist.
         
-        if not alerts["features"]: return None # If "features" is null.
+        self._record_feed_lineage(alerts.get("features") or [])
+        self._apply_feed_replacements() # Before compiling, so replacements are recognized as such this cycle.
+        
+        if not alerts["features"]: return [] # If "features" is null.
         
         for feature in alerts["features"]: # Define basic parameters.
             props = feature.get("properties")
+            stored = self.ActiveAlerts.get(feature["id"])
+            
+            if stored and stored.get("sent") == props.get("sent", ""): # Already have this exact product, nothing to compile.
+                continue
+            
             geometry = feature.get("geometry", {})
             parameters = props.get("parameters", {})
             
@@ -194,6 +380,10 @@ class Alerts():
             
             nws_headline = first_or_empty(parameters.get("NWSheadline", [])) or props.get("headline", "No title") # Apply helper function to headline.
             
+            vtecs = parse_vtec(parameters.get("VTEC", []), props.get("sent", ""))
+            references = props.get("references", "")
+            primary = primary_vtec(vtecs)
+            
             aZones = props.get("affectedZones", [])
             eventCode = props.get("eventCode", {})
             SAME_LIST = eventCode.get("SAME", [])
@@ -223,7 +413,7 @@ class Alerts():
                     coordinates = [zones.get_zone_geo(a) for a in areas] # Check area to zone geodata.
                     coordBase = "Area" # Area for county-based or region-based alerts.
                     
-                compiled_alerts.append({ # Compile each individual alert that we have.
+                compiled_alerts.append(Alert.from_dict({ # Compile each individual alert that we have.
                     "id": feature["id"],
                     "sent": props.get("sent", ""),
                     "expires": props.get("expires", ""),
@@ -245,60 +435,117 @@ class Alerts():
                     "coords": coordinates,
                     "base": coordBase,
                     "countiesAffected": counties,
-                    "references": props.get("references", ""),
+                    "references": references,
                     "replacedBy": props.get("replacedBy", ""),
                     "replacedAt": props.get("replacedAt", ""),
                     "ignore": False,
+                    "posted": False,
+                    "vtecKeys": self._resolve_event_keys(vtecs, references), # Operational events only, test products fall back to the heuristics.
+                    "vtecAction": primary.action if primary else "",
                     **param_values,
-                })
+                }))
         
         return compiled_alerts # Return list of compiled alerts.
     
-    def check_internal(self): # Internally check alerts: add specific information if it's been added.
-        if self.ActiveAlerts == None: 
+    def _record_feed_lineage(self, features: list): # Lineage of everything in the feed, impacted or not, so check_internal doesn't have to ask for it.
+        self.feedLineage = {}
+        self.feedReferenced = {}
+        
+        for feature in features:
+            props = feature.get("properties") or {}
+            
+            self.feedLineage[feature["id"]] = {
+                "replacedBy": props.get("replacedBy", ""),
+                "replacedAt": props.get("replacedAt", ""),
+                "references": props.get("references", ""),
+            }
+            
+            for ref in props.get("references") or []:
+                refId = ref.get("@id")
+                
+                if refId and (refId not in self.feedReferenced or props.get("sent", "") < self.feedReferenced[refId][1]): # The earliest product referencing it is its direct successor.
+                    self.feedReferenced[refId] = (feature["id"], props.get("sent", ""))
+                
+    def _apply_feed_replacements(self): # A stored alert that left the feed and is referenced by a product in it was replaced by that product.
+        for aid, (replacedBy, replacedAt) in self.feedReferenced.items():
+            info = self.ActiveAlerts.get(aid)
+            
+            if info is not None and aid not in self.feedLineage:
+                self._apply_lineage(aid, info, {"replacedBy": replacedBy, "replacedAt": replacedAt})
+                
+    async def check_internal(self): # Internally check alerts: bring replacedBy and references up to date.
+        if not self.ActiveAlerts: 
             log.info(f"❌ No alerts to filter. {len(self.ActiveAlerts)} are active.")
             return
         
+        if self.feedLineage is None:
+            log.warn("No active feed this cycle, skipping internal checks.")
+            return
+        
+        now = datetime.now(timezone.utc)
+        
+        toFetch = [] # Left the feed. Fetched once, only if still valid and no feed product points back at it.
+        
+        for alert, info in self.ActiveAlerts.items():
+            if alert in self.feedLineage or alert in self.detailChecked or alert in self.feedReferenced:
+                continue
+            
+            expires = info.get("expires")
+            
+            if expires and datetime.fromisoformat(expires) >= now:
+                toFetch.append(alert)
+                
+        details = await alertDetails.get_many(toFetch)
+        
         totalChecked = 0
+        fetched = 0
         failed = 0
-        completed = 0
         updated = 0
         
-        for alert, info in self.ActiveAlerts.items():
+        for alert, info in list(self.ActiveAlerts.items()):
+            props = self.feedLineage.get(alert) # Still in the feed, which already carries its lineage.
             
-            wasUpdated = False
-            didFail = False
+            if props is None:
+                if alert not in toFetch:
+                    continue
+                
+                newInfo = details.get(alert)
+                
+                if not newInfo or not newInfo.get("properties"):
+                    failed += 1
+                    continue
+                
+                fetched += 1
+                self.detailChecked.add(alert)
+                props = newInfo["properties"]
             
             totalChecked += 1
-            newInfo = self._poll_internal_alerts(alert)
             
-            if newInfo and newInfo["properties"]:
-                props = newInfo["properties"]
-                
-                replacedBy = props.get("replacedBy", "")
-                replacedAt = props.get("replacedAt", "")
-                references = props.get("references", "")
-                
-                if replacedBy or references: 
-                    if replacedBy and not info.get("replacedBy"):
-                        self.ActiveAlerts[alert]["replacedBy"] = replacedBy
-                        self.ActiveAlerts[alert]["replacedAt"] = replacedAt 
-                        wasUpdated = True
-                    if references:
-                        if self.ActiveAlerts[alert].get("references") != references:
-                            self.ActiveAlerts[alert]["references"] = references
-                            wasUpdated = True
-            else:
-                failed += 1
-                didFail = True
-            
-            if wasUpdated:
+            if self._apply_lineage(alert, info, props):
                 updated += 1
-            
-            if not didFail:
-                completed += 1
         
-        log.info(f"Completed internal checks. {totalChecked} alerts checked, {failed} alerts failed to be checked, {completed} were successfully checked, and {updated} alerts were updated.")
+        self.detailChecked &= self.ActiveAlerts.keys() # Forget alerts that were cleaned up.
+        
+        log.info(f"Completed internal checks. {totalChecked} alerts checked, {fetched} fetched individually, {failed} failed to be fetched, and {updated} alerts were updated.")
+        
+    def _apply_lineage(self, alert: str, info: dict, props: dict) -> bool:
+        replacedBy = props.get("replacedBy", "")
+        replacedAt = props.get("replacedAt", "")
+        references = props.get("references", "")
+        
+        changes = {}
+        
+        if replacedBy and not info.get("replacedBy"):
+            changes["replacedBy"] = replacedBy
+            changes["replacedAt"] = replacedAt
+            
+        if references and info.get("references") != references:
+            changes["references"] = references
+            
+        if changes:
+            self._update_lineage(alert, **changes)
+            
+        return bool(changes)
         
     def _check_for_similar(self, alert: dict) -> tuple[bool, str]:
         
@@ -307,68 +554,63 @@ class Alerts():
             return False, None
         
         log.info("Checking for similar alerts.")
-        norm_title = self.normalize(alert["title"])
-        norm_description = self.normalize(alert["desc"])
         
-        for key, info in self.ActiveAlerts.items():
-            if key == alert["id"]:
+        if len(self.ActiveAlerts) <= SIMILARITY_FULL_SCAN: # Small enough to check exactly, like before the index.
+            candidates = set(self.ActiveAlerts)
+        else:
+            candidates = self.similarity.candidates(self._similarity_text(alert)) # Only alerts sharing a band with this one, not the whole active set.
+        
+        for key in sorted(candidates):
+            if key == alert["id"] or key not in self.ActiveAlerts:
                 continue
             
-            ref_title = self.normalize(info["title"])
-            ref_description = self.normalize(info["desc"])
-            
-            title_ratio = difflib.SequenceMatcher(None, norm_title, ref_title).ratio() * 100
-            desc_ratio = difflib.SequenceMatcher(None, norm_description, ref_description).ratio() * 100
-            
-            log.info(f"{alert["id"]} vs {key}: Title similarity {title_ratio:.2f}%, Description similarity {desc_ratio:.2f}%")
-            
-            if title_ratio >= 85.0 and desc_ratio >= 85.0:
-                log.info(f"Similar alert found: {key} and {alert["id"]} with title similarity {title_ratio:.2f}% and description similarity {desc_ratio:.2f}%")
+            if self._is_similar(alert, key):
                 return True, key
             
         log.info("No similar alerts were found.")
         return False, None
         
-    def _poll_active_alerts(self) -> dict:
-        url = "https://api.weather.gov/alerts/active?area=FL"
-
-        try:
-            r = requests.get(url, headers=self.requestHeader)  # keep as Response object
-            if r.status_code != 200:
-                log.error(f"⚠️ API returned status {r.status_code}: {r.text[:200]}")
-                return []
-
-            try:
-                return r.json()
-            except requests.exceptions.JSONDecodeError:
-                log.error("⚠️ Response was not valid JSON!")
-                log.error(f"Response text: {r.text[:200]}")  # Log first 200 chars
-                return []
-        except requests.exceptions.RequestException as e:
-            log.error(f"⚠️ Request failed: {e}")
-            return []
-        
-    def _poll_internal_alerts(self, url: str):
-        try:
-            r = requests.get(url, headers=self.requestHeader)  # keep as Response object
-            if r.status_code != 200:
-                log.error(f"⚠️ API returned status {r.status_code}: {r.text[:200]}")
-                return []
-
-            try:
-                return r.json()
-            except requests.exceptions.JSONDecodeError:
-                log.error("⚠️ Response was not valid JSON!")
-                log.error(f"Response text: {r.text[:200]}")  # Log first 200 chars
-                return []
-        except requests.exceptions.RequestException as e:
-            log.error(f"⚠️ Request failed: {e}")
-            return []
+    def _is_similar(self, alert: dict, key: str) -> bool: # Title and description both at least 85% alike.
+        info = self.ActiveAlerts[key]
+        
+        title_matcher = difflib.SequenceMatcher(None, self.normalize(alert["title"]), self.normalize(info["title"]))
+        desc_matcher = difflib.SequenceMatcher(None, self.normalize(alert["desc"]), self.normalize(info["desc"]))
+        
+        if title_matcher.real_quick_ratio() < 0.85 or desc_matcher.quick_ratio() < 0.85: # Cheap upper bounds, the full ratio can't reach 85% either.
+            return False
+        
+        title_ratio = title_matcher.ratio() * 100
+        desc_ratio = desc_matcher.ratio() * 100
+        
+        log.info(f"{alert["id"]} vs {key}: Title similarity {title_ratio:.2f}%, Description similarity {desc_ratio:.2f}%")
+        
+        if title_ratio >= 85.0 and desc_ratio >= 85.0:
+            log.info(f"Similar alert found: {key} and {alert["id"]} with title similarity {title_ratio:.2f}% and description similarity {desc_ratio:.2f}%")
+            return True
+        
+        return False
+        
+    async def _poll_active_alerts(self) -> dict:
+        return await httpClient.get_json(ACTIVE_URL) or []
         
     def provide_alerts(self):
         return self.ActiveAlerts
     
     def write_to_alerts(self, data: dict):
-        self.ActiveAlerts = data
+        self.store.clear()
+        self.similarity.clear()
+        self.replacedByIndex = {}
+        self.referenceIndex = {}
+        self.eventIndex = {}
+        self.threatIds = set()
+        
+        for info in data.values():
+            alert = info if isinstance(info, Alert) else Alert.from_dict(info)
+            
+            if "posted" not in alert: alert["posted"] = True # Older save files only held alerts that had been posted (or ignored).
+            
+            self._add_active(alert)
+            
+        self.store.mark_clean() # Straight from the save file, nothing to write back.
         
 alerts = Alerts()
\ No newline at end of file
@@ -1,15 +1,12 @@
-import requests
 import datetime
 from datetime import datetime, timezone, timedelta, time
-import os
-from dotenv import load_dotenv
 from services.syslogger import log
-load_dotenv("../sensitive.env")
+from utils import httpClient
 
 class Forecasts():
     
     def __init__(self):
-        self.requestHeader = {f"User-Agent": os.environ.get('HEADER')}
+        self.dirty = True # ForecastStates changed since the last save.
         self.ForecastStates = {
             "Morning": False,
             "Afternoon": False,
@@ -30,27 +27,13 @@ class Forecasts():
             }
         }
         
-    def _poll_forecast(self):
+    async def _poll_forecast(self):
         url = "https://api.weather.gov/gridpoints/MLB/26,68/forecast?units=us"
     
-        try:
-            r = requests.get(url, headers=self.requestHeader)  # keep as Response object
-            if r.status_code != 200:
-                log.error(f"⚠️ API returned status {r.status_code}: {r.text[:200]}")
-                return []
-
-            try:
-                return r.json()
-            except requests.exceptions.JSONDecodeError:
-                log.error("⚠️ Response was not valid JSON!")
-                log.error(f"Response text: {r.text[:200]}")  # Log first 200 chars
-                return []
-        except requests.exceptions.RequestException as e:
-            log.error(f"⚠️ Request failed: {e}")
-            return []
+        return await httpClient.get_json(url) or []
         
-    def get_forecasts(self) -> list:
-        data = self._poll_forecast()
+    async def get_forecasts(self) -> list:
+        data = await self._poll_forecast()
         
         forecastInfo = []
         
@@ -73,24 +56,30 @@ class Forecasts():
                 
         return forecastInfo
     
-    def time_to_post_forecast(self) -> tuple[bool, list]:
+    async def time_to_post_forecast(self) -> tuple[bool, list]:
         currentTime = datetime.now().time()
         for time, posted in self.ForecastStates.items():
             if (self.ForecastTimes[time]["Start"] <= currentTime <= self.ForecastTimes[time]["End"]) and not posted:
                 self.ForecastStates[time] = True
-                forecastInfo = self.get_forecasts()
+                self.dirty = True
+                forecastInfo = await self.get_forecasts()
                 
                 return True, forecastInfo
         
         return False, None
     
+    def open_windows(self) -> list: # (start, end) of the posting windows not posted yet today.
+        return [(t["Start"], t["End"]) for name, t in self.ForecastTimes.items() if not self.ForecastStates.get(name)]
+    
     def return_forecast_states(self) -> dict:
         return self.ForecastStates
     
     def write_forecast_states(self, statesToWrite: dict):
         self.ForecastStates = statesToWrite
+        self.dirty = False # Just loaded, nothing new to save.
         
     def reset_states(self):
         for state in self.ForecastStates:
             self.ForecastStates[state] = False
+        self.dirty = True
             
\ No newline at end of file
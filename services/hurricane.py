@@ -2,12 +2,13 @@ import html
 import xml.etree.ElementTree as ET
 import datetime
 import re
-import requests
 from datetime import datetime, timezone, timedelta, time
+from utils import httpClient
 
 class Hurricane():
     
     def __init__(self):
+        self.dirty = True # ForecastStates changed since the last save.
         self.ForecastStates = {
             "Midnight": False,
             "Morning": False,
@@ -51,15 +52,12 @@ class Hurricane():
         text = re.sub(r'\n{3,}', '\n\n', text).strip()
         return text
         
-    def _poll_hurricane_info(self) -> tuple[str, str]:
-        xml_content = None
+    async def _poll_hurricane_info(self) -> tuple[str, str]:
         rss_url = "https://www.nhc.noaa.gov/gtwo.xml"
-        if xml_content is None:
-            response = requests.get(rss_url)
-            response.raise_for_status()
-            xml_content = response.content
-
-        root = ET.fromstring(xml_content)
+        root = await httpClient.get_parsed(rss_url, ET.fromstring) # Parsed tree is cached, an unchanged feed isn't parsed again.
+            
+        if root is None: # Request failed, already logged by the client.
+            return None, None
 
         image_url = None
         discussion_text = None
@@ -89,7 +87,7 @@ class Hurricane():
         
         return image_url, discussion_text
     
-    def time_to_post_hurricane(self) -> tuple[bool, str, str]: # Determine if the timing is right to post hurricane information.
+    async def time_to_post_hurricane(self) -> tuple[bool, str, str]: # Determine if the timing is right to post hurricane information.
         currentTime = datetime.now().time() # Current time.
         
         if not 6 <= datetime.now().month <= 11:
@@ -99,18 +97,26 @@ class Hurricane():
         for time, posted in self.ForecastStates.items(): 
             if (self.ForecastTimes[time]["Start"] <= currentTime <= self.ForecastTimes[time]["End"]) and not posted: # Check every period's start and end time.
                 self.ForecastStates[time] = True # If we are within the start and end time and we have not posted, then we will post.
-                image, discussion = self._poll_hurricane_info()
+                self.dirty = True
+                image, discussion = await self._poll_hurricane_info()
+                
+                if discussion is None: return False, None, None
                 
                 return True, image, discussion # Return True, and then the image and discussion text.
             
         return False, None, None # Not time to post.
     
+    def open_windows(self) -> list: # (start, end) of the posting windows not posted yet today.
+        return [(t["Start"], t["End"]) for name, t in self.ForecastTimes.items() if not self.ForecastStates.get(name)]
+    
     def return_forecast_states(self) -> dict:
         return self.ForecastStates
     
     def write_forecast_states(self, statesToWrite: dict):
         self.ForecastStates = statesToWrite
+        self.dirty = False # Just loaded, nothing new to save.
         
     def reset_states(self):
         for state in self.ForecastStates:
-            self.ForecastStates[state] = False
\ No newline at end of file
+            self.ForecastStates[state] = False
+        self.dirty = True
\ No newline at end of file
@@ -1,7 +1,8 @@
-import requests
+import asyncio
 from datetime import datetime, time
-from utils import zoneManager
+from utils import zoneManager, httpClient
 from shapely.geometry import Polygon, shape, MultiPolygon
+from shapely.strtree import STRtree
 from services.syslogger import log
 
 outlooks = {
@@ -28,9 +29,31 @@ conversions = {
 
 RISK_ORDER = ["MRGL", "SLGT", "ENH", "MDT", "HIGH"]
 
+def county_risks(features: list, names: list, tree: STRtree) -> dict: # County -> highest category of the features touching it. Runs in a worker thread.
+    hits = {}
+    
+    for feature in features:
+        risk = (feature.get("properties") or {}).get("LABEL")
+        
+        if risk not in RISK_ORDER or not feature.get("geometry"): continue
+        
+        geom = shape(feature["geometry"])
+        
+        if geom.is_empty: continue
+        
+        for i in sorted(tree.query(geom, predicate="intersects")):
+            name = names[i]
+            
+            if name not in hits or RISK_ORDER.index(risk) > RISK_ORDER.index(hits[name]):
+                hits[name] = risk
+                
+    return hits
+
 class OutlookHandler():
     def __init__(self):
         print("Running")
+        self.day1Risk = None # Highest Day 1 category touching a monitored county, refreshed by refresh_day1_risk.
+        self.countyShapes = None # (ZONE_GEOMETRY it was built from, county names, STRtree of county shapes).
         self.posted_outlooks = {
             "day_1": {
                 "morning": {
@@ -98,59 +121,41 @@ class OutlookHandler():
             },
         }
         
-    def check_area(self, day: str):
-        print("Checking area")
-        hits = {}
+    def _county_shapes(self) -> tuple: # (county names, STRtree of their shapes). Built once per set of zones, not per feature per check.
+        geometry = zoneManager.ZONE_GEOMETRY
         
-        data = None
+        if self.countyShapes is None or self.countyShapes[0] is not geometry: # Zones are swapped in whole when they refresh.
+            names = []
+            shapes = []
+            
+            for zone, coords in geometry.items():
+                names.append(zoneManager.name_from_zone(zone))
+                shapes.append(MultiPolygon([Polygon(ply[0]) for ply in coords]))
+                
+            self.countyShapes = (geometry, names, STRtree(shapes))
+            
+        return self.countyShapes[1], self.countyShapes[2]
         
-        link = outlooks[day]
+    async def check_area(self, day: str): # County -> highest category touching it.
+        data = await httpClient.get_json(outlooks[day])
         
-        try:
-            data = requests.get(link, timeout=10).json()
-        except Exception as e:
-            print(f"Error occurred: {e}")
-                
-        if data:
-            for feature in data["features"]:
-                print("Found features")
-                geom = shape(feature["geometry"])
-                props = feature.get("properties", {})
-                risk_label = props["LABEL"]
-                    
-                if risk_label not in RISK_ORDER: continue    
-                
-                if not geom: continue
-                    
-                for county_name, county_coords in zoneManager.ZONE_GEOMETRY.items():
-                    polygons = []
-                    for ply in county_coords:
-                        polygons.append(Polygon(ply[0]))
-                    multipoly = MultiPolygon(polygons)
-                    
-                    true_name = zoneManager.name_from_zone(county_name)
-                    
-                    print("Comparing county geometry " + true_name + " with outlook geometry.")
-                        
-                    if geom.intersects(multipoly):
-                        if true_name not in hits:
-                            print("New county hit: " + true_name + " with risk " + risk_label)
-                            hits[true_name] = risk_label
-                        elif true_name in hits:
-                            currentRisk = hits[true_name]
-                            currentPrio = RISK_ORDER.index(currentRisk)
-                            newPrio = RISK_ORDER.index(risk_label)
-                                
-                            if newPrio > currentPrio:
-                                print("New priority for county.")
-                                hits[true_name] = risk_label
-                                   
-        return hits
+        if not data: return {}
+        
+        names, tree = self._county_shapes()
+        
+        return await asyncio.to_thread(county_risks, data.get("features") or [], names, tree) # Shapely work stays off the event loop, the alert poll never waits on it.
+    
+    async def refresh_day1_risk(self): # Highest Day 1 category over our counties, read by the alert poller to tighten its interval.
+        hits = await self.check_area("day_1")
+        self.day1Risk = max(hits.values(), key=RISK_ORDER.index) if hits else None
+        
+    def day1_at_least(self, risk: str) -> bool:
+        return self.day1Risk is not None and RISK_ORDER.index(self.day1Risk) >= RISK_ORDER.index(risk)
     
-    def create_day_information(self, day):
+    async def create_day_information(self, day):
         msg = f"**Counties Impacted On $d**"
         
-        impacted = self.check_area(day)
+        impacted = await self.check_area(day)
         
         highest_risk = "None"
         
@@ -167,31 +172,28 @@ class OutlookHandler():
             
         return highest_risk, msg
     
-    def get_outlook_geo(self, day):
+    async def get_outlook_geo(self, day):
         link = outlooks[day]
         
-        try:
-            data = requests.get(link, timeout=10).json()
+        data = await httpClient.get_json(link)
             
-            if data and data["features"]:
-                return data["features"]
-        except Exception as e:
-            print(f"Error occurred: {e}")
+        if data and data["features"]:
+            return data["features"]
             
-    def check_to_return(self, day):
-        hits = self.check_area(day)
+    async def check_to_return(self, day):
+        hits = await self.check_area(day)
         
         if not hits: return None, None, None, None
         
-        highest_risk, msg = self.create_day_information(day)
+        highest_risk, msg = await self.create_day_information(day)
         
-        geom = self.get_outlook_geo(day)
+        geom = await self.get_outlook_geo(day)
         
         if not geom: return None, None, None, None
         
         return hits, highest_risk, msg, geom
             
-    def check_outlook(self):
+    async def check_outlook(self):
         print("Checking outlook")
         to_post = {}
         
@@ -200,7 +202,7 @@ class OutlookHandler():
                 for time, info in self.posted_outlooks[day].items():
                     if info["Start"] <= datetime.now().time() <= info["End"] and not info["ran"]:
                         print("Checking outlook for " + day + " at time " + time)
-                        hits, highest_risk, msg, geom = self.check_to_return(day)
+                        hits, highest_risk, msg, geom = await self.check_to_return(day)
                         
                         if hits is not None:
                             to_post[day] = {
@@ -215,7 +217,7 @@ class OutlookHandler():
                 info = self.posted_outlooks[day]
                 if info["Start"] <= datetime.now().time() <= info["End"] and not info["ran"]:
                     print("Checking outlook for " + day)
-                    hits, highest_risk, msg, geom = self.check_to_return(day)
+                    hits, highest_risk, msg, geom = await self.check_to_return(day)
                     
                     if hits is not None:
                         to_post[day] = {
@@ -229,6 +231,15 @@ class OutlookHandler():
                     
         return to_post
             
+    def open_windows(self) -> list: # (start, end) of every outlook window not run yet today.
+        windows = []
+        
+        for data in self.posted_outlooks.values():
+            for info in ([data] if "ran" in data else data.values()):
+                if not info["ran"]: windows.append((info["Start"], info["End"]))
+                
+        return windows
+    
     def reset_states(self):
         log.info("Resetting outlook states.")
         for day in self.posted_outlooks.values():
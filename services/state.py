@@ -1,8 +1,42 @@
+import os
 import json
-import warnings
+import time
+import atexit
+import sqlite3
+import threading
+import config
 from services.syslogger import log
 
-fileLocation = "json_data.json"
+fileLocation = "json_data.json" # Old single-file store, read once to migrate.
+databaseLocation = "state.db"
+
+'''
+Everything the bot remembers across restarts, kept in SQLite.
+Each alert, each day of statistics and each service's state is its own row, and a save only writes the rows whose
+contents changed since the last one, all inside one transaction. WAL journaling means a crash mid-save leaves the
+previous save intact instead of a half-written file.
+
+Saves are write-behind. write_data only queues the sections that changed and returns; a background thread waits
+stateWriteDelay seconds so a burst of saves folds into one, then writes them. The event loop never waits on disk.
+Whatever is still queued is written on exit.
+'''
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS service_state (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS track_ids (name TEXT PRIMARY KEY, next_id INTEGER);
+CREATE TABLE IF NOT EXISTS stats (day TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+TABLE_KEYS = { # Table -> (key column, value column). Alerts are written by id as they change and aren't listed here.
+    "service_state": ("name", "data"),
+    "track_ids": ("name", "next_id"),
+    "stats": ("day", "data"),
+}
+
+def encode(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
 
 class State():
     def __init__(self):
@@ -14,38 +48,183 @@ class State():
             "trackId": {},
             "stats": {},
         }
+        self.written = {table: {} for table in TABLE_KEYS} # Table -> {key: value as last written}, to skip unchanged rows.
+        self.pending = {} # Sections queued for the writer, newer saves merged over older ones.
+        self.condition = threading.Condition()
+        self.closing = False
+        self.conn = sqlite3.connect(databaseLocation, check_same_thread=False) # Loaded here, written only by the writer thread after.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL") # Safe with WAL, a crash can lose the last save but never corrupts.
+        self.conn.executescript(SCHEMA)
         self.open_data()
         
+        self.writer = threading.Thread(target=self._run_writer, name="state-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
     def open_data(self):
         try:
+            if not self.conn.execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone():
+                self._migrate_json()
+
+            self._load()
+            log.info("State database found and read.")
+        except (sqlite3.Error, Exception) as E:
+            log.critical("Error while attempting to load the state database!")
+            raise RuntimeError(f"ERROR OCCURRED WHILE LOADING STATE. ERROR: {E}")
+
+    def _migrate_json(self): # First start on SQLite: carry the old json file over, once. The file itself is left alone.
+        data = {}
+
+        if os.path.exists(fileLocation):
             with open(fileLocation) as f:
-                data = json.load(f)
-                log.info("File found and read.")
-                if data:
-                    self.data = data
-        except (FileNotFoundError, Exception) as E:
-            log.critical("Error while attempting to load JSON file!")
-            raise RuntimeError(f"ERROR OCCURRED WHILE LOADING JSON FILE. ERROR: {E}")
-            
-    def write_data(self, forecast: dict | None, hurricane: dict | None, alerts: dict | None, timing: str | None, trackId: str | None, stats: dict | None):
-        tempData = {
-            "forecast": forecast,
-            "hurricane": hurricane,
-            "alerts": alerts,
-            "timing": timing,
-            "trackId": trackId,
-            "stats": stats,
-        }
+                data = json.load(f) or {}
+            log.info(f"Migrating {fileLocation} into {databaseLocation}.")
+        else:
+            log.warn(f"No {fileLocation} to migrate, starting with empty state.")
+
+        sections = {name: data[name] for name in ("forecast", "hurricane", "timing", "trackId", "stats") if data.get(name) is not None}
+        sections["alerts"] = {"changed": data.get("alerts") or {}, "removed": []}
         
-        for d, v in tempData.items():
-            if v is not None:
-                self.data[d] = v
-                
-        try:
-            with open(fileLocation, "w") as f:
-                json.dump(self.data, f, indent=2)
-        except Exception as E:
-            log.warn(f"ISSUE WHEN WRITING TO FILE: {E}")
-                
+        with self.conn:
+            self._save(sections)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', ?)", (fileLocation if data else "",))
+
+    def _read_written(self): # What is on disk right now, row by row.
+        for table, (keyColumn, valueColumn) in TABLE_KEYS.items():
+            self.written[table] = dict(self.conn.execute(f"SELECT {keyColumn}, {valueColumn} FROM {table}"))
+
+    def _load(self):
+        self._read_written()
+
+        services = self.written["service_state"]
+
+        self.data["alerts"] = {aid: json.loads(text) for aid, text in self.conn.execute("SELECT id, data FROM alerts")}
+
+        for name in ("forecast", "hurricane", "timing"):
+            if name in services:
+                self.data[name] = json.loads(services[name])
+
+        if "next" in self.written["track_ids"]:
+            self.data["trackId"] = self.written["track_ids"]["next"]
+
+        stats = {}
+
+        for day, text in self.written["stats"].items():
+            year, month, date = day.split("-")
+            stats.setdefault(year, {}).setdefault(month, {})[date] = json.loads(text)
+
+        if stats or "statsPostTimes" in services:
+            self.data["stats"] = {"postTimes": json.loads(services.get("statsPostTimes", "{}")), "stats": stats}
+
+    def _sync(self, table: str, rows: dict, prune: bool = False) -> int: # Upsert rows that differ from what was last written. Returns how many were.
+        keyColumn, valueColumn = TABLE_KEYS[table]
+        written = self.written[table]
+        changed = []
+
+        for key, value in rows.items():
+            if table != "track_ids": value = encode(value)
+
+            if written.get(key) != value:
+                changed.append((key, value))
+                written[key] = value
+
+        if changed:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {table} ({keyColumn}, {valueColumn}) VALUES (?, ?)", changed)
+
+        if prune:
+            gone = [key for key in written if key not in rows]
+
+            if gone:
+                self.conn.executemany(f"DELETE FROM {table} WHERE {keyColumn} = ?", [(key,) for key in gone])
+                for key in gone: del written[key]
+
+            return len(changed) + len(gone)
+
+        return len(changed)
+
+    def _save(self, sections: dict) -> int:
+        rowsWritten = 0
+        services = {name: sections[name] for name in ("forecast", "hurricane", "timing") if name in sections}
+
+        if "stats" in sections:
+            stats = sections["stats"]
+            services["statsPostTimes"] = stats.get("postTimes", {})
+            days = {f"{year}-{month}-{date}": info for year, months in stats.get("stats", {}).items() for month, dates in months.items() for date, info in dates.items()}
+            rowsWritten += self._sync("stats", days, prune=True)
+
+        if "alerts" in sections: # Only the records that changed, and the ids that went away.
+            alerts = sections["alerts"]
+            self.conn.executemany("INSERT OR REPLACE INTO alerts (id, data) VALUES (?, ?)", [(aid, encode(row)) for aid, row in alerts["changed"].items()])
+            self.conn.executemany("DELETE FROM alerts WHERE id = ?", [(aid,) for aid in alerts["removed"]])
+            rowsWritten += len(alerts["changed"]) + len(alerts["removed"])
+
+        if sections.get("trackId") not in (None, {}):
+            rowsWritten += self._sync("track_ids", {"next": int(sections["trackId"])})
+
+        rowsWritten += self._sync("service_state", services)
+
+        return rowsWritten
+
+    def _merge(self, sections: dict, older: bool = False): # Fold sections into the queue. Older sections never overwrite newer ones.
+        for name, value in sections.items():
+            if name != "alerts":
+                if not (older and name in self.pending): self.pending[name] = value
+                continue
+
+            queued = self.pending.setdefault("alerts", {"changed": {}, "removed": []})
+
+            for aid in value["removed"]:
+                if older and aid in queued["changed"]: continue
+                queued["changed"].pop(aid, None)
+                if aid not in queued["removed"]: queued["removed"].append(aid)
+
+            for aid, row in value["changed"].items():
+                if older and (aid in queued["changed"] or aid in queued["removed"]): continue
+                if aid in queued["removed"]: queued["removed"].remove(aid)
+                queued["changed"][aid] = row
+
+    def write_data(self, sections: dict): # Queue changed sections (forecast, hurricane, alerts, timing, trackId, stats). Returns right away.
+        if not sections: return
+
+        with self.condition:
+            self._merge(sections)
+            self.condition.notify()
+
+    def _run_writer(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+
+                if not self.pending: return # Closing with nothing left.
+
+            if not self.closing: time.sleep(config.stateWriteDelay) # Give a burst of saves time to pile up into this write.
+
+            with self.condition:
+                sections, self.pending = self.pending, {}
+
+            try:
+                with self.conn: # One transaction, every row of this save lands or none do.
+                    rowsWritten = self._save(sections)
+
+                if rowsWritten: log.info(f"State saved, {rowsWritten} rows changed.")
+            except Exception as E:
+                self._read_written() # The transaction was rolled back, resync and queue it again under anything newer.
+                log.warn(f"ISSUE WHEN WRITING STATE: {E}")
+
+                with self.condition:
+                    self._merge(sections, older=True)
+
+                if not self.closing: time.sleep(config.stateWriteDelay)
+                else: return
+
+    def close(self): # Write whatever is queued and stop the writer.
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+
+        self.writer.join(timeout=10)
+
     def send_to_disseminate(self):
-        return self.data
\ No newline at end of file
+        return self.data
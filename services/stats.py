@@ -2,6 +2,7 @@ from datetime import datetime, time
 
 class AlertStatistics():
     def __init__(self):
+        self.dirty = True # Statistics changed since the last save.
         self.Statistics = {
             "postTimes": {
                 "yearly": False,
@@ -13,6 +14,7 @@ class AlertStatistics():
         
     def add_stat(self, counties: list, alertCode: str):
         stats = self.Statistics["stats"]
+        self.dirty = True
         
         refYear = str(datetime.now().year)
         refMonth = str(datetime.now().month)
@@ -60,6 +62,7 @@ class AlertStatistics():
         
     def write_to_stats(self, newData):
         self.Statistics = newData
+        self.dirty = False
         
     def provide_stats(self) -> dict:
         return self.Statistics
\ No newline at end of file
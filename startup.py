@@ -1,45 +1,58 @@
 import os 
 from dotenv import load_dotenv
-import discord
-from discord import app_commands
-from discord import SyncWebhook
 import asyncio
-from brain import Controller
-from bot import client
 import config
 from services.syslogger import log
 load_dotenv('sensitive.env')
 
-@client.event
-async def on_ready():
-    
-    if not hasattr(client, "controller_task") or client.controller_task is None:
-        log.info("🧠 Starting Controller for the first time...")
-        client.controller_task = asyncio.create_task(Controller().run())
+'''
+Render workers are spawned, and spawn re-imports this module in each of them (as __mp_main__).
+brain and bot are only imported under the __main__ guard, otherwise every worker would build its own Discord client
+and a Controller's worth of singletons, the state database included.
+'''
+
+def controller_stopped(task: asyncio.Task): # The Controller runs for the life of the bot, it ending at all is worth a loud log.
+    if task.cancelled():
+        log.warn("Controller task was cancelled.")
+    elif task.exception():
+        log.critical(f"Controller task failed: {task.exception()!r}")
     else:
-        log.info("🔁 Controller already running — skipping restart.")
-    
-    log.info("Successful login!")
-    log.info(f'✅ Logged in as user {client.user})')
-    
-@client.event
-async def on_disconnect():
-    log.info("❌ Discord client has disconnected.")
-    
-@client.event
-async def on_message(payload: discord.Message):
-    author = payload.author
+        log.critical("Controller task ended.")
+
+def register_events(client, Controller):
+    import discord
     
-    if author != client.user and author.bot == False:
-        if client.user in payload.mentions:
-            channel = client.get_channel(payload.channel)
-            
-            try:
-                await payload.reply("Hello!")
-            except Exception as e:
-                log.error("Error when replying.")
+    @client.event
+    async def on_ready():
+        
+        if not hasattr(client, "controller_task") or client.controller_task is None:
+            log.info("🧠 Starting Controller for the first time...")
+            client.controller_task = asyncio.create_task(Controller().run())
+            client.controller_task.add_done_callback(controller_stopped)
+        else:
+            log.info("🔁 Controller already running — skipping restart.")
+        
+        log.info("Successful login!")
+        log.info(f'✅ Logged in as user {client.user})')
+        
+    @client.event
+    async def on_disconnect():
+        log.info("❌ Discord client has disconnected.")
+        
+    @client.event
+    async def on_message(payload: discord.Message):
+        author = payload.author
+        
+        if author != client.user and author.bot == False:
+            if client.user in payload.mentions:
+                channel = client.get_channel(payload.channel)
+                
+                try:
+                    await payload.reply("Hello!")
+                except Exception as e:
+                    log.error("Error when replying.")
     
-def login():
+def login(client):
     max_tries = 5 # Max login attempts
     tries = 0 # Current number of attempts to login
     successful = False
@@ -51,9 +64,13 @@ def login():
             if client.is_closed():
                 log.warn("❌ Discord client is closed. Exiting login attempts.")
     
-login()
+if __name__ == "__main__": # Render workers re-import this module when they spawn, nothing below may run in them.
+    from brain import Controller
+    from bot import client
     
-
+    register_events(client, Controller)
+    login(client)
     
 
+    
 
@@ -1,19 +1,33 @@
 from .determiner import determiner
 from .geometry import (
     generate_alert_image,
-    ucf_in_or_near_polygon,
+    generate_outlook_image,
 )
 from .timing import Time
 from .trackid import identifier
 from .channels import channels
+from .http_client import httpClient
+from .alert_details import alertDetails
+from .layers import layerStore
+from .points_of_interest import poiIndex
+from .render import renderPool
+from .scheduler import scheduler
+from .dispatcher import dispatcher
 from .zones import zoneManager
 
 __all__ = [
     "determiner",
     "generate_alert_image",
-    "ucf_in_or_near_polygon",
+    "generate_outlook_image",
     "Time",
     "identifier",
     "channels",
+    "httpClient",
+    "alertDetails",
+    "layerStore",
+    "poiIndex",
+    "renderPool",
+    "scheduler",
+    "dispatcher",
     "zoneManager",
-]
+]
\ No newline at end of file
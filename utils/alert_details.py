@@ -0,0 +1,50 @@
+import asyncio
+import config
+from services.syslogger import log
+from .http_client import httpClient
+
+'''
+Detail lookups for single alerts, keyed by product id (the api.weather.gov url of the alert).
+Lineage checks and replacement checks can ask for the same product in one cycle. Callers asking for an id
+that is already being fetched wait on that one request instead of sending their own. Answers are cached by
+httpClient like every other response, there is no second cache here. Misses are fetched in parallel,
+at most alertDetailConcurrency at a time.
+'''
+
+class AlertDetails():
+    def __init__(self):
+        self.inflight = {} # Product id -> task fetching it right now.
+        self.semaphore = None # Made lazily, it has to belong to the running loop.
+        
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(config.alertDetailConcurrency)
+        return self.semaphore
+    
+    async def get(self, aid: str) -> dict | None:
+        task = self.inflight.get(aid)
+        
+        if task is None: # First caller starts the request, everyone after joins it.
+            task = asyncio.create_task(self._fetch(aid))
+            self.inflight[aid] = task
+            task.add_done_callback(lambda _: self.inflight.pop(aid, None))
+            
+        return await asyncio.shield(task) # One caller being cancelled must not cancel the request for the others.
+    
+    async def get_many(self, aids: list) -> dict: # {id: data} for every id that could be fetched.
+        aids = list(dict.fromkeys(aids))
+        results = await asyncio.gather(*(self.get(aid) for aid in aids))
+        
+        return {aid: data for aid, data in zip(aids, results) if data}
+    
+    async def _fetch(self, aid: str) -> dict | None:
+        async with self._get_semaphore():
+            data = await httpClient.get_json(aid) # Fresh or revalidated from httpClient's cache when it can be.
+            
+        if not data:
+            log.warn(f"Could not fetch details for {aid}.")
+            return None
+        
+        return data
+    
+alertDetails = AlertDetails()
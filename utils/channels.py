@@ -6,7 +6,6 @@ from services.syslogger import log
 load_dotenv("sensitive.env")
 
 from discord import SyncWebhook
-from bot import client
 
 class Channels():
     
@@ -16,6 +15,8 @@ class Channels():
         log.info("initalizing CHANNELS")
         
     def sync_channels(self): # Probably a better way to handle this, but we'll work about that later.
+        from bot import client # Here, not at the top. Render workers import utils and must not build a Discord client of their own.
+        
         for channel, cId in config.channels.items():
             self.SYNCED_CHANNELS[channel] = client.get_channel(cId)
         
@@ -1,3 +1,5 @@
+import config
+
 class Determiner():
     
     def __init__(self):
@@ -32,6 +34,7 @@ class Determiner():
             "test": 1,
             "unknown": 0,
         }
+        self.urgentPriority = 1000 # priority() at or above this is an alert we ping for, a WEA activation, or one flagged for broadcast.
     
     def determine(self, WEA, messageType: str, severity: str, certainty: str, urgency: str):
         if WEA: # If WEAhandling is a parameter, then we know WEAS is activated.
@@ -41,6 +44,29 @@ class Determiner():
             return "BULLETIN - IMMEDIATE BROADCAST REQUESTED"
         
         return None
+    
+    def priority(self, alert) -> int:
+        '''
+        How soon an alert should go out, higher first. Codes we ping for and WEA activations lead, then whatever determine() would flag
+        for broadcast, then the rest. Within each of those it goes by severity, then urgency, then certainty.
+        '''
+        rank = lambda types, value: types.get(str.lower(value or "unknown"), 1)
+        
+        severity = rank(self.sTypes, alert.get("severity"))
+        urgency = rank(self.uTypes, alert.get("urgency"))
+        certainty = rank(self.cTypes, alert.get("certainty"))
+        
+        if alert.get("WEAHandling") or alert.get("SAME_code") in config.alertCodes:
+            tier = 2
+        elif rank(self.mTypes, alert.get("messageType")) >= 3 and severity >= 4 and certainty >= 4 and urgency >= 4: # Same test as determine().
+            tier = 1
+        else:
+            tier = 0
+            
+        if rank(self.statusTypes, alert.get("status")) < 2: # Tests and exercises go after every real alert.
+            tier -= 3
+        
+        return tier * self.urgentPriority + severity * 100 + urgency * 10 + certainty
             
 determiner = Determiner()
             
\ No newline at end of file
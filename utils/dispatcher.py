@@ -0,0 +1,56 @@
+import asyncio
+import itertools
+from services.syslogger import log
+
+'''
+Outbound Discord messages, one queue per channel.
+Each channel is drained by its own task, so channels post side by side. Within a channel the highest priority message goes next,
+messages of the same priority keep their order. A warning queued behind a pile of advisories goes out ahead of them.
+discord.py already waits out each route's rate limit bucket; a queue per channel keeps us from piling requests onto a bucket
+that's already waiting, and a slow or rate limited channel only delays itself.
+'''
+
+class Dispatcher():
+    def __init__(self):
+        self.queues = {} # Channel id -> asyncio.PriorityQueue of (-priority, sequence, send, future).
+        self.sequence = itertools.count() # Ties on priority go first come, first served.
+        self.workers = {} # Channel id -> task draining that queue.
+
+    def submit(self, channel, send, priority: int = 0) -> asyncio.Future:
+        '''
+        Queue send, a coroutine function taking no arguments, on channel's queue. The returned future resolves to what it returned.
+        send is awaited in turn with everything else queued for that channel, higher priority first.
+        send must never wait on anything queued on another channel. With priorities, two channels can each hold a send
+        waiting on the other's queue and neither ever moves again. Submit the dependent send once what it needs is done instead.
+        '''
+        future = asyncio.get_running_loop().create_future()
+        key = channel.id
+
+        if key not in self.queues:
+            self.queues[key] = asyncio.PriorityQueue()
+
+        self.queues[key].put_nowait((-priority, next(self.sequence), send, future))
+
+        if key not in self.workers or self.workers[key].done():
+            self.workers[key] = asyncio.create_task(self._drain(key), name=f"dispatch-{key}")
+
+        return future
+
+    async def _drain(self, key):
+        queue = self.queues[key]
+
+        while True:
+            _, _, send, future = await queue.get()
+
+            try:
+                result = await send()
+            except Exception as E: # send is expected to handle its own retries, anything left is a failure for this message only.
+                log.error(f"Dispatch to channel {key} failed: {E}")
+                result = False
+
+            if not future.done():
+                future.set_result(result)
+
+            queue.task_done()
+
+dispatcher = Dispatcher()
@@ -1,4 +1,5 @@
 from . import reference_locations
+from .layers import layerStore, roads_shp, lakes_base_shp, rivers_base_shp, lakes_supp_shp, rivers_supp_shp, urban_shp
 import config
 from services.syslogger import log
 
@@ -7,7 +8,6 @@ import cartopy.feature as cfeature
 from cartopy.io.shapereader import natural_earth, Reader
 from cartopy.feature import ShapelyFeature
 from shapely.geometry import Point, Polygon, MultiPolygon
-import geopandas as gpd
 import math
 import matplotlib.pyplot as plt
 from io import BytesIO
@@ -24,50 +24,6 @@ COUNTIES_WFO = {
     "KBTW": ["polk"],
 }
 
-ucf = Point(-81.2001, 28.6024) # UCF coords for shapely polygon checking
-ucf_point = gpd.GeoSeries([Point(ucf)], crs="EPSG:4326") # Converting UCF to GeoSeries now so we aren't doing this over and over again for just one point.
-ucf_point_m = ucf_point.to_crs(epsg=6439) # Convert to local CRS, this one being Florida East in meters.
-
-meters_to_miles = 1609.34
-
-roads_shp = "natural_earth/roads/ne_10m_roads_north_america.shp" # Natural Earth road shapefile path.
-lakes_base_shp = "natural_earth/lakes_base/ne_10m_lakes.shp"
-rivers_base_shp = "natural_earth/rivers_base/ne_10m_rivers_lake_centerlines.shp"
-lakes_supp_shp = "natural_earth/lakes_supp_ne/ne_10m_lakes_north_america.shp"
-rivers_supp_shp = "natural_earth/rivers_supp_ne/ne_10m_rivers_north_america.shp"
-urban_shp = "natural_earth/urban/ne_10m_urban_areas.shp"
-
-def ucf_in_or_near_polygon(geodat: list) -> tuple[bool, str]: # Specific to figuring out if UCF is included or near the alert polygon, only for WEAS handling.
-    if not geodat:
-        return False, ""
-    
-    poly = Polygon(geodat[0])
-
-    if ucf.within(poly):
-        return True, "within"
-    
-    gdf_alert = gpd.GeoSeries([poly], crs="EPSG:4326")
-
-    gdf_alert_m = gdf_alert.to_crs(epsg=6439)  # NAD83 / Florida East (meters)
-    
-    poly_m = gdf_alert_m.iloc[0]
-    point_m = ucf_point_m.iloc[0]
-    
-    dist_m = point_m.distance(poly_m)
-    
-    dist_miles = dist_m / meters_to_miles
-
-    # Buffer UCF point by X miles (1 mile ≈ 1609.34 m)
-    
-    buffer_meters = config.bufferMiles
-    
-    buf_m = buffer_meters * meters_to_miles
-    
-    if dist_m <= buf_m:
-        return True, "around"
-    
-    return False, ""
-    
 def filter_points_in_bounds(points: list, bounds: float) -> list:
     """
     points: list of tuples (name, lat, lon)
@@ -103,15 +59,14 @@ def get_bounds_from_multipoylgon(multipoly, buffer_miles=0):
 
     return min_lon, max_lon, min_lat, max_lat
 
-def safe_geometries(reader):
-    return [g for g in reader.geometries() if g is not None]
-
 def generate_outlook_image(risks):
     log.info("Generating outlook image")
     fig, ax = plt.subplots(figsize=(14, 10), subplot_kw={'projection': ccrs.PlateCarree()})
     
+    extent = [-85.0, -79.0, 24.0, 31.0]  # [west, east, south, north]
+    
     ax.set_extent(
-        [-85.0, -79.0, 24.0, 31.0],  # [west, east, south, north]
+        extent,
         crs=ccrs.PlateCarree()
     )
     
@@ -122,9 +77,8 @@ def generate_outlook_image(risks):
     ax.add_feature(cfeature.BORDERS.with_scale('10m'), edgecolor='black', zorder=3)
     ax.add_feature(cfeature.STATES.with_scale('10m'), edgecolor='black', zorder=3)
     
-    counties_shp = natural_earth(resolution='10m', category='cultural', name='admin_2_counties')
     counties_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(counties_shp)),
+        geometries=layerStore.query("counties", extent),
         crs=ccrs.PlateCarree(),
         facecolor='none',
         edgecolor='red',
@@ -135,7 +89,7 @@ def generate_outlook_image(risks):
         ax.add_feature(counties_feature)
 
     roads_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(roads_shp)),
+        geometries=layerStore.query("roads", extent),
         crs=ccrs.PlateCarree(),
         edgecolor='darkslategray',  # whatever color you like
         facecolor='none',
@@ -145,7 +99,7 @@ def generate_outlook_image(risks):
         ax.add_feature(roads_feature)
         
     lakes_base_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(lakes_base_shp)),
+        geometries=layerStore.query("lakes", extent),
         crs=ccrs.PlateCarree(),
         edgecolor='lightblue',  # whatever color you like
         facecolor='lightblue',
@@ -154,16 +108,6 @@ def generate_outlook_image(risks):
     if lakes_base_feature is not None:
         ax.add_feature(lakes_base_feature)
         
-    rivers_base_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(lakes_base_shp)),
-        crs=ccrs.PlateCarree(),
-        edgecolor='lightblue',  # whatever color you like
-        facecolor='lightblue',
-        zorder=3,
-    )
-    if rivers_base_feature is not None:
-        ax.add_feature(rivers_base_feature)
-        
     for risk in risks:
         if risk["geometry"] is None:
             continue
@@ -222,6 +166,10 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
     
     minx, miny, maxx, maxy = multipoly.bounds # Define bounds.
     
+    lon_pad = 1  # wider east-west
+    lat_pad = .25  # shorter north-south
+    extent = [minx - lon_pad, maxx + lon_pad, miny - lat_pad, maxy + lat_pad] # Layers are only queried for what falls inside this.
+    
     fig, ax = plt.subplots(
         figsize=(14, 10),
         subplot_kw={'projection': ccrs.PlateCarree()}
@@ -237,9 +185,8 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
     ax.add_feature(cfeature.BORDERS.with_scale('10m'), edgecolor='black', zorder=3)
     ax.add_feature(cfeature.STATES.with_scale('10m'), edgecolor='black', zorder=3)
     
-    counties_shp = natural_earth(resolution='10m', category='cultural', name='admin_2_counties')
     counties_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(counties_shp)),
+        geometries=layerStore.query("counties", extent),
         crs=ccrs.PlateCarree(),
         facecolor='none',
         edgecolor='red',
@@ -250,7 +197,7 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
         ax.add_feature(counties_feature)
 
     roads_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(roads_shp)),
+        geometries=layerStore.query("roads", extent),
         crs=ccrs.PlateCarree(),
         edgecolor='darkslategray', 
         facecolor='none',
@@ -260,7 +207,7 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
         ax.add_feature(roads_feature)
         
     lakes_base_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(lakes_base_shp)),
+        geometries=layerStore.query("lakes", extent),
         crs=ccrs.PlateCarree(),
         edgecolor='lightblue',  
         facecolor='lightblue',
@@ -269,16 +216,6 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
     if lakes_base_feature is not None:
         ax.add_feature(lakes_base_feature)
         
-    rivers_base_feature = ShapelyFeature(
-        geometries=safe_geometries(Reader(lakes_base_shp)),
-        crs=ccrs.PlateCarree(),
-        edgecolor='lightblue',  
-        facecolor='lightblue',
-        zorder=3,
-    )
-    if rivers_base_feature is not None:
-        ax.add_feature(rivers_base_feature)
-        
     ax.add_geometries(
         multipoly, 
         crs=ccrs.PlateCarree(), 
@@ -292,9 +229,7 @@ def generate_alert_image(coords: list, base: str, alertCode: str, polyColor: str
     if alertCode in CODES_WITH_IMAGES: 
         print("Getting radar image")
         
-    lon_pad = 1  # wider east-west
-    lat_pad = .25  # shorter north-south
-    ax.set_extent([minx - lon_pad, maxx + lon_pad, miny - lat_pad, maxy + lat_pad], crs=ccrs.PlateCarree())
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
     
     bounds = get_bounds_from_multipoylgon(multipoly, 10)
     
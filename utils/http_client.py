@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import asyncio
+import aiohttp
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+import config
+from services.syslogger import log
+load_dotenv('../sensitive.env')
+
+'''
+Every upstream feed (api.weather.gov, SPC, NHC) goes through here.
+One pooled, keep-alive session is shared by all of the services so the event loop never blocks on a request.
+The session is created lazily, it has to be made inside of the running loop.
+
+Responses are cached by url and honor ETag / Last-Modified / Cache-Control.
+While an entry is fresh no request is made. Once stale it is revalidated, and a 304 hands back the object parsed last time.
+Cached objects are shared between callers, treat them as read-only.
+A 429/503 with Retry-After puts that host on hold; until it passes the cached copy (or None) is returned without a request.
+One-off bulk fetches (zone geometry) can skip the cache, they'd only push out the feeds that are read every cycle.
+'''
+
+class CachedResponse():
+    __slots__ = ("value", "etag", "lastModified", "freshUntil")
+    
+    def __init__(self, value, etag: str | None, lastModified: str | None, freshUntil: float):
+        self.value = value # Parsed body, returned as-is on a hit.
+        self.etag = etag
+        self.lastModified = lastModified
+        self.freshUntil = freshUntil # time.monotonic() deadline.
+
+def parse_json(body: bytes):
+    return json.loads(body)
+
+def parse_text(body: bytes) -> str:
+    return body.decode("utf-8", errors="replace")
+
+def cache_lifetime(headers) -> float | None: # Seconds a response stays fresh, or None if it must not be stored.
+    directives = {}
+    
+    for part in headers.get("Cache-Control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name] = value.strip('"')
+    
+    if "no-store" in directives: return None
+    if "no-cache" in directives: return 0
+    
+    try:
+        maxAge = int(directives.get("max-age") or 0)
+        age = int(headers.get("Age") or 0) # Time already spent in an upstream cache (api.weather.gov sits behind Akamai).
+    except ValueError:
+        return 0
+    
+    return max(0, maxAge - age)
+
+def retryable(status: int | None) -> bool: # Worth asking again: no response at all, rate limited, or a server error. A 404 or 400 won't change.
+    return status is None or status == 429 or status >= 500
+
+def retry_after_seconds(value: str | None) -> float | None: # Retry-After is either seconds or an HTTP date.
+    if not value: return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HttpClient():
+    
+    def __init__(self):
+        self.session = None
+        self.cache = OrderedDict() # (url, parser) -> CachedResponse, least recently used first.
+        self.retryAfter = {} # host -> time.monotonic() before which the host asked us not to come back (429/503 Retry-After).
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            requestHeader = {}
+            if os.environ.get('HEADER'): # NWS wants to know who is making requests. Read here since the env file is loaded after imports.
+                requestHeader["User-Agent"] = os.environ.get('HEADER')
+            
+            connector = aiohttp.TCPConnector(
+                limit=config.httpMaxConnections,
+                limit_per_host=config.httpConnectionsPerHost,
+                keepalive_timeout=config.httpKeepAlive,
+            )
+            timeout = aiohttp.ClientTimeout(total=config.httpTimeout, connect=config.httpConnectTimeout)
+            
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=requestHeader)
+        return self.session
+    
+    async def get_parsed(self, url: str, parser, headers: dict | None = None):
+        value, _ = await self.fetch(url, parser, headers)
+        return value
+        
+    async def fetch(self, url: str, parser, headers: dict | None = None, cache: bool = True) -> tuple: # (parsed value or None, HTTP status or None if no response came back).
+        key = (url, parser) # Same url may be read as text and as json, keep them apart.
+        entry = self.cache.get(key) if cache else None
+        now = time.monotonic()
+        
+        if entry and now < entry.freshUntil: # Still fresh per max-age, no need to ask upstream at all.
+            self.cache.move_to_end(key)
+            return entry.value, 200
+        
+        host = urlsplit(url).netloc
+        
+        if now < self.retryAfter.get(host, 0): # Told to back off, don't ask again until then.
+            log.warn(f"Holding off on {host} for {self.retryAfter[host] - now:.0f} more seconds.")
+            return (entry.value if entry else None), 429
+        
+        requestHeader = dict(headers or {})
+        
+        if entry: # Revalidate what we already have. A 304 costs one small round trip instead of the whole body.
+            if entry.etag: requestHeader["If-None-Match"] = entry.etag
+            if entry.lastModified: requestHeader["If-Modified-Since"] = entry.lastModified
+        
+        try:
+            async with self._get_session().get(url, headers=requestHeader) as r:
+                if r.status == 304 and entry:
+                    entry.freshUntil = now + (cache_lifetime(r.headers) or 0)
+                    self.cache.move_to_end(key)
+                    return entry.value, 304
+                
+                if r.status in (429, 503):
+                    wait = retry_after_seconds(r.headers.get("Retry-After"))
+                    
+                    if wait: self.retryAfter[host] = now + wait
+                
+                if r.status != 200:
+                    text = await r.text(errors="replace")
+                    log.error(f"⚠️ API returned status {r.status}: {text[:200]}")
+                    return None, r.status
+                
+                body = await r.read()
+                responseHeader = r.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.error(f"⚠️ Request failed: {url} {e!r}")
+            return None, None
+        
+        try:
+            value = parser(body)
+        except (ValueError, SyntaxError): # JSONDecodeError is a ValueError, XML ParseError is a SyntaxError.
+            log.error("⚠️ Response could not be parsed!")
+            log.error(f"Response text: {body[:200]}")  # Log first 200 chars
+            return None, 200
+        
+        lifetime = cache_lifetime(responseHeader)
+        etag = responseHeader.get("ETag")
+        lastModified = responseHeader.get("Last-Modified")
+        
+        if not cache or lifetime is None or not (lifetime or etag or lastModified): # Skipping the cache, no-store, or nothing to revalidate with.
+            self.cache.pop(key, None)
+            return value, 200
+        
+        self.cache[key] = CachedResponse(value, etag, lastModified, now + lifetime)
+        self.cache.move_to_end(key)
+        
+        while len(self.cache) > config.httpCacheEntries: # Drop the least recently used entry.
+            self.cache.popitem(last=False)
+        
+        return value, 200
+        
+    def fresh_for(self, url: str, parser=parse_json) -> float: # Seconds until the cached copy of url goes stale, 0 if there is none.
+        entry = self.cache.get((url, parser))
+        return max(0.0, entry.freshUntil - time.monotonic()) if entry else 0.0
+    
+    def retry_after(self, url: str) -> float: # Seconds left on a Retry-After from url's host.
+        return max(0.0, self.retryAfter.get(urlsplit(url).netloc, 0) - time.monotonic())
+        
+    async def get_json(self, url: str, headers: dict | None = None):
+        return await self.get_parsed(url, parse_json, headers)
+        
+    async def get_text(self, url: str, headers: dict | None = None) -> str | None:
+        return await self.get_parsed(url, parse_text, headers)
+    
+    async def get_json_retrying(self, url: str, retries: int, backoff: float, semaphore: asyncio.Semaphore | None = None, cache: bool = True):
+        for attempt in range(retries + 1):
+            if semaphore:
+                async with semaphore: # Only hold a slot while actually requesting, not while backing off.
+                    data, status = await self.fetch(url, parse_json, cache=cache)
+            else:
+                data, status = await self.fetch(url, parse_json, cache=cache)
+            
+            if data is not None:
+                return data
+            
+            if not retryable(status):
+                log.warn(f"Not retrying {url}, status {status}.")
+                return None
+            
+            if attempt < retries:
+                delay = backoff * (2 ** attempt)
+                log.warn(f"Retrying {url} in {delay:.1f} seconds (attempt {attempt + 1}/{retries}).")
+                await asyncio.sleep(delay)
+        
+        return None
+        
+    async def get_many_json(self, urls: list, concurrency: int, retries: int = 0, backoff: float = 1.0, cache: bool = True) -> dict: # Fetch urls in parallel, at most `concurrency` at a time. Failures are left out, the rest are kept.
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        results = await asyncio.gather(*(self.get_json_retrying(url, retries, backoff, semaphore, cache) for url in urls))
+        
+        return {url: data for url, data in zip(urls, results) if data is not None}
+    
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        
+httpClient = HttpClient()
@@ -0,0 +1,69 @@
+from services.syslogger import log
+
+from cartopy.io.shapereader import natural_earth, Reader
+from shapely.geometry import box
+from shapely.strtree import STRtree
+
+'''
+Natural Earth layers used by the map renders, loaded once instead of on every render.
+Only geometries touching FLORIDA_BOUNDS are kept, which drops nearly all of the North American roads and world counties.
+Geometries are kept whole rather than cut at the box, cutting polygons would draw fake outlines along its edges.
+Each layer is held in an STRtree so a render only gets the geometries inside its extent.
+'''
+
+FLORIDA_BOUNDS = (-88.0, 24.0, -79.0, 32.0) # minx, miny, maxx, maxy. Covers the outlook extent and padded alert extents.
+
+roads_shp = "natural_earth/roads/ne_10m_roads_north_america.shp" # Natural Earth road shapefile path.
+lakes_base_shp = "natural_earth/lakes_base/ne_10m_lakes.shp"
+rivers_base_shp = "natural_earth/rivers_base/ne_10m_rivers_lake_centerlines.shp"
+lakes_supp_shp = "natural_earth/lakes_supp_ne/ne_10m_lakes_north_america.shp"
+rivers_supp_shp = "natural_earth/rivers_supp_ne/ne_10m_rivers_north_america.shp"
+urban_shp = "natural_earth/urban/ne_10m_urban_areas.shp"
+
+class Layer():
+    
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.geometries = []
+        self.tree = STRtree([])
+        
+    def load(self):
+        region = box(*FLORIDA_BOUNDS)
+        
+        self.geometries = [g for g in Reader(self.path).geometries() if g is not None and g.intersects(region)]
+        self.tree = STRtree(self.geometries)
+        
+        log.info(f"Loaded {len(self.geometries)} {self.name} geometries inside the region.")
+        
+    def query(self, extent: list) -> list: # extent is [west, east, south, north], the same order ax.set_extent takes.
+        west, east, south, north = extent
+        
+        hits = self.tree.query(box(west, south, east, north), predicate="intersects")
+        
+        return [self.geometries[i] for i in sorted(hits)] # Sorted keeps the shapefile's draw order.
+
+class LayerStore():
+    
+    def __init__(self):
+        self.layers = {}
+        self.loaded = False
+        
+    def load(self): # Parses the shapefiles. Slow, do this once at startup and not on the event loop.
+        if self.loaded: return
+        
+        counties_shp = natural_earth(resolution='10m', category='cultural', name='admin_2_counties')
+        
+        for name, path in (("counties", counties_shp), ("roads", roads_shp), ("lakes", lakes_base_shp)):
+            layer = Layer(name, path)
+            layer.load()
+            self.layers[name] = layer
+            
+        self.loaded = True
+        
+    def query(self, name: str, extent: list) -> list:
+        if not self.loaded: self.load()
+        
+        return self.layers[name].query(extent)
+        
+layerStore = LayerStore()
@@ -0,0 +1,107 @@
+from . import reference_locations
+import config
+from services.syslogger import log
+
+import shapely
+from shapely.geometry import Polygon
+from shapely.strtree import STRtree
+from pyproj import Transformer
+
+'''
+Registry of the places alerts get routed for: UCF, its other campuses (config.pointsOfInterest) and the reference cities.
+Every point has its own buffer distance and, optionally, a channel to route to and the counties an alert must cover for it to be routed there.
+Points are projected to Florida East once, buffered there in real meters, and the buffers are brought back to EPSG:4326 and held in an STRtree.
+Alert polygons are queried as-is, no reprojection per site or per alert.
+'''
+
+meters_to_miles = 1609.34
+
+to_florida_east = Transformer.from_crs("EPSG:4326", "EPSG:6439", always_xy=True) # NAD83 / Florida East (meters). Built once, building these is the slow part.
+to_lon_lat = Transformer.from_crs("EPSG:6439", "EPSG:4326", always_xy=True)
+
+class PointOfInterest():
+    __slots__ = ("name", "lat", "lon", "bufferMiles", "target", "counties")
+    
+    def __init__(self, name: str, lat: float, lon: float, bufferMiles: float, target: str | None, counties: tuple | None = None):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.bufferMiles = bufferMiles
+        self.target = target # Channel key in config.channels, or None to only track the point.
+        self.counties = counties # Only routed when the alert covers one of these counties. None routes on proximity alone.
+
+class PointsOfInterest():
+    
+    def __init__(self):
+        self.points = []
+        self.areas = []
+        self.tree = STRtree([])
+        self.build()
+        
+    def build(self):
+        points = []
+        
+        for name, info in config.pointsOfInterest.items():
+            lat, lon = info["coords"]
+            points.append(PointOfInterest(name, lat, lon, info.get("bufferMiles", 0), info.get("target"), info.get("counties")))
+        
+        for name, lat, lon in reference_locations.city_points:
+            if name in config.pointsOfInterest: continue # Explicit entries win over the reference list.
+            points.append(PointOfInterest(name, lat, lon, config.cityPointBufferMiles, config.cityPointTargets.get(name)))
+        
+        if not points:
+            self.points, self.areas, self.tree = [], [], STRtree([])
+            return
+        
+        xs, ys = to_florida_east.transform([p.lon for p in points], [p.lat for p in points]) # Every point in one call.
+        distances = [p.bufferMiles * meters_to_miles for p in points]
+        
+        buffered = shapely.buffer(shapely.points(xs, ys), distances, quad_segs=32)
+        buffered = shapely.transform(buffered, to_lon_lat.transform, interleaved=False)
+        
+        # A zero buffer leaves an empty polygon, those points are matched on the point itself.
+        self.areas = [area if p.bufferMiles > 0 else shapely.Point(p.lon, p.lat) for p, area in zip(points, buffered)]
+        self.points = points
+        self.tree = STRtree(self.areas)
+        
+        log.info(f"Indexed {len(points)} points of interest.")
+        
+    def query(self, geodat: list) -> list[PointOfInterest]: # Points whose buffer touches the alert polygon.
+        if not geodat: return []
+        
+        hits = self.tree.query(Polygon(geodat[0]), predicate="intersects")
+        
+        return [self.points[i] for i in sorted(hits)]
+    
+    def query_many(self, geodats: list) -> list[list[PointOfInterest]]: # Every polygon against every point in a single tree query.
+        results = [[] for _ in geodats]
+        polys = [Polygon(g[0]) if g else None for g in geodats]
+        
+        if not polys: return results
+        
+        alertIdx, pointIdx = self.tree.query(polys, predicate="intersects")
+        
+        for a, p in sorted(zip(alertIdx, pointIdx)):
+            results[a].append(self.points[p])
+            
+        return results
+    
+    def targets(self, geodat: list, counties: list | None = None) -> list[str]:
+        return route_targets(self.query(geodat), counties)
+    
+    def targets_many(self, geodats: list, counties: list | None = None) -> list[list[str]]: # counties, if given, holds each alert's affected counties.
+        counties = counties or [None] * len(geodats)
+        return [route_targets(hits, affected) for hits, affected in zip(self.query_many(geodats), counties)]
+    
+def route_targets(points: list[PointOfInterest], counties: list | None = None) -> list[str]: # Unique channel keys, in registry order.
+    targets = []
+    
+    for p in points:
+        if p.counties and counties is not None and not set(p.counties) & set(counties): continue # Near the site, but not in the counties it's limited to.
+        
+        if p.target and p.target not in targets:
+            targets.append(p.target)
+            
+    return targets
+    
+poiIndex = PointsOfInterest()
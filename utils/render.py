@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import config
+from services.syslogger import log
+
+'''
+Map renders are CPU-heavy (cartopy, matplotlib, 200 dpi PNGs) and used to freeze the event loop while they ran.
+They now run in a pool of worker processes. Each worker imports cartopy, loads the 10m features and the layer store once when it starts,
+so a render job only pays for drawing. Jobs are awaited as futures, several alerts can render at once on separate cores.
+
+Workers use the "spawn" start method. Forking a process that is running the Discord client and its threads isn't safe.
+Spawn re-imports startup.py in each worker, which is why brain, bot and login() there are all behind a __main__ guard,
+and why utils.channels only imports the Discord client when channels are synced.
+'''
+
+def _warm_worker(): # Runs once in every worker process as it starts.
+    import matplotlib
+    matplotlib.use("Agg") # No display in the workers.
+    import cartopy.feature as cfeature
+    from utils.layers import layerStore
+    
+    for feature in (cfeature.LAND, cfeature.OCEAN, cfeature.LAKES, cfeature.RIVERS, cfeature.BORDERS, cfeature.STATES):
+        feature.with_scale('10m').geometries() # Cartopy caches these per process after the first read.
+        
+    layerStore.load()
+
+def _ready() -> bool:
+    return True
+
+def _render_alert(coords: list, base: str, alertCode: str, polyColor: str, trackId: str, countiesAffected: list) -> bytes | None:
+    from utils.geometry import generate_alert_image
+    
+    buf = generate_alert_image(coords, base, alertCode, polyColor, trackId, countiesAffected)
+    return buf.getvalue() if buf else None
+
+def _render_outlook(risks: list) -> bytes | None:
+    from utils.geometry import generate_outlook_image
+    
+    buf = generate_outlook_image(risks)
+    return buf.getvalue() if buf else None
+
+class RenderPool():
+    
+    def __init__(self):
+        self.executor = None
+        
+    def start(self): # Start and warm every worker now so the first alert doesn't wait on imports and shapefiles.
+        if self.executor is not None: return
+        
+        workers = max(1, config.renderWorkers)
+        
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+        
+        for _ in range(workers):
+            self.executor.submit(_ready)
+        
+        log.info(f"Render pool started with {workers} workers.")
+        
+    async def _submit(self, job, *args) -> BytesIO | None:
+        self.start()
+        
+        loop = asyncio.get_running_loop()
+        executor = self.executor # The pool this job runs on. By the time it fails, another render may have replaced it already.
+        
+        try:
+            data = await loop.run_in_executor(executor, job, *args)
+        except BrokenProcessPool: # A worker died (out of memory, usually). Replace the pool, this render is lost.
+            if self.executor is executor: # Only the first render to notice replaces it, the rest leave the new pool alone.
+                log.error("⚠️ Render pool broke, restarting it.")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+                self.start()
+            return None
+        except Exception as e:
+            log.error(f"⚠️ Render failed: {e}")
+            return None
+        
+        return BytesIO(data) if data else None
+        
+    async def alert_image(self, coords: list, base: str, alertCode: str, polyColor: str, trackId: str, countiesAffected: list) -> BytesIO | None:
+        return await self._submit(_render_alert, coords, base, alertCode, polyColor, trackId, countiesAffected)
+    
+    async def outlook_image(self, risks: list) -> BytesIO | None:
+        return await self._submit(_render_outlook, risks)
+    
+renderPool = RenderPool()
@@ -0,0 +1,103 @@
+import random
+import asyncio
+from datetime import datetime, timedelta
+from services.syslogger import log
+
+'''
+Runs each service as its own task on its own cadence, so a slow outlook render or hurricane fetch never holds up the alert poll.
+A job is either periodic (every N seconds, N can be worked out fresh each run) or tied to wall-clock windows, ex. the forecast
+posting times: it sleeps until the next window opens and rechecks inside it until the service marks it done.
+Each job awaits its own run before sleeping, so a job never overlaps itself. An exception, from the job or from working out
+its next delay, is logged and the job carries on.
+'''
+
+FALLBACK_DELAY = 60 # Seconds to sleep when a job's interval couldn't be worked out.
+
+def seconds_until_window(windows, now: datetime | None = None) -> float | None:
+    '''
+    Seconds until the nearest (start, end) window opens, 0 if one is open now, None if there are none.
+    Windows are datetime.time pairs, a window that has passed today is counted from tomorrow.
+    '''
+    now = now or datetime.now()
+    best = None
+
+    for start, end in windows:
+        if start <= now.time() <= end:
+            return 0.0
+
+        opens = datetime.combine(now.date(), start)
+
+        if opens < now: opens += timedelta(days=1)
+
+        wait = (opens - now).total_seconds()
+        best = wait if best is None else min(best, wait)
+
+    return best
+
+class Job():
+    __slots__ = ("name", "func", "interval", "jitter", "task")
+
+    def __init__(self, name: str, func, interval, jitter: float):
+        self.name = name
+        self.func = func # Coroutine function, called with no arguments.
+        self.interval = interval # Seconds, or a callable returning seconds, worked out after every run.
+        self.jitter = jitter # Up to this many seconds added to each sleep so jobs drift apart instead of firing together.
+        self.task = None
+
+    def next_delay(self) -> float:
+        delay = self.interval() if callable(self.interval) else self.interval
+        return max(0.0, delay) + random.uniform(0, self.jitter)
+
+class Scheduler():
+    def __init__(self):
+        self.jobs = {}
+
+    def every(self, name: str, func, interval, jitter: float = 0.0):
+        self.jobs[name] = Job(name, func, interval, jitter)
+
+    def in_windows(self, name: str, func, windows, recheck: float = 60, idle: float = 900, jitter: float = 5.0):
+        '''
+        Run func while one of windows() is open, every recheck seconds, and sleep until the next one opens otherwise.
+        windows is called every time so windows the service already finished drop out. idle caps the sleep so
+        state resets (a new day) are picked up.
+        '''
+        def interval():
+            wait = seconds_until_window(windows())
+
+            if wait is None: return idle
+            if wait == 0: return recheck
+            return min(wait, idle)
+
+        self.jobs[name] = Job(name, func, interval, jitter)
+
+    async def _run(self, job: Job):
+        while True:
+            try:
+                await job.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as E:
+                log.error(f"Scheduled job {job.name} failed: {E}")
+
+            try:
+                delay = job.next_delay()
+            except Exception as E: # A bad interval mustn't end the job, the next run may well work it out.
+                log.error(f"Scheduled job {job.name} could not work out its next run, trying again in {FALLBACK_DELAY} seconds: {E}")
+                delay = FALLBACK_DELAY
+
+            await asyncio.sleep(delay)
+
+    def start(self):
+        for job in self.jobs.values():
+            if job.task is None or job.task.done(): # Never two copies of the same job.
+                job.task = asyncio.create_task(self._run(job), name=job.name)
+
+    async def run(self): # Start every job and wait on them, for as long as the bot runs.
+        self.start()
+        await asyncio.gather(*(job.task for job in self.jobs.values()))
+
+    def stop(self):
+        for job in self.jobs.values():
+            if job.task: job.task.cancel()
+
+scheduler = Scheduler()
@@ -0,0 +1,73 @@
+import numpy as np
+
+'''
+MinHash / LSH index over character shingles, used to find alerts whose text is nearly the same without comparing against every active alert.
+Each text is cut into overlapping SHINGLE_SIZE character shingles. Its signature is the minimum of NUM_PERM hash permutations over those shingles.
+The signature is split into BANDS bands; texts that share any band land in the same bucket and become candidates.
+Scattered edits break a lot of shingles, two texts 85% alike by SequenceMatcher can share only 30-40% of them. So the bands are narrow:
+with 64 bands of 2 rows a pair at 30% shingle overlap comes up as a candidate 99.8% of the time, at 20% about 93%.
+That lets some unrelated pairs through as well, which is fine. The index only narrows the field, callers still confirm each
+candidate with their own exact comparison.
+'''
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+
+MERSENNE_PRIME = np.uint64((1 << 31) - 1) # Shingle hashes are 32 bit and a < 2^31, so a * x + b stays inside uint64.
+
+class SimilarityIndex():
+    
+    def __init__(self):
+        rng = np.random.default_rng(8675309) # Fixed seed, signatures only need to agree within one process.
+        self.a = rng.integers(1, int(MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE_PRIME), size=NUM_PERM, dtype=np.uint64)
+        self.buckets = {} # (band, band bytes) -> set of keys.
+        self.keyBands = {} # key -> its bucket keys, so it can be removed.
+        
+    def signature(self, text: str) -> np.ndarray:
+        if len(text) <= SHINGLE_SIZE:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+        
+        hashes = np.fromiter((hash(s) & 0xFFFFFFFF for s in shingles), dtype=np.uint64, count=len(shingles))
+        
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+    
+    def _bands(self, text: str) -> list:
+        sig = self.signature(text)
+        return [(band, sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+    
+    def add(self, key: str, text: str):
+        if key in self.keyBands: self.remove(key)
+        
+        bands = self._bands(text)
+        
+        for band in bands:
+            self.buckets.setdefault(band, set()).add(key)
+            
+        self.keyBands[key] = bands
+        
+    def remove(self, key: str):
+        for band in self.keyBands.pop(key, []):
+            bucket = self.buckets.get(band)
+            
+            if bucket is None: continue
+            
+            bucket.discard(key)
+            
+            if not bucket: del self.buckets[band]
+            
+    def candidates(self, text: str) -> set:
+        found = set()
+        
+        for band in self._bands(text):
+            found.update(self.buckets.get(band, ()))
+            
+        return found
+    
+    def clear(self):
+        self.buckets = {}
+        self.keyBands = {}
@@ -5,17 +5,20 @@ class Time():
     
     def __init__(self):
         self.LastDate = str(datetime.now().date())
+        self.dirty = True # LastDate changed since the last save.
         
     def is_new_day(self):
         Today = str(datetime.now().date())
         if self.LastDate != Today:
             self.LastDate = Today
+            self.dirty = True
             return True
         else:
             return False
         
     def write_last_date(self, varToWrite: str):
         self.LastDate = varToWrite
+        self.dirty = False
     
     def provide(self):
         return self.LastDate
\ No newline at end of file
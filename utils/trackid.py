@@ -5,6 +5,7 @@ FIRST = 1
 class Identifier():
     def __init__(self):
         self.nextTrackId = None
+        self.dirty = False # nextTrackId changed since the last save.
         
     def issue_identifier(self):
         
@@ -13,6 +14,7 @@ class Identifier():
         oldIdentifier = self.nextTrackId
         
         self.nextTrackId = self.increment_id(self.nextTrackId)
+        self.dirty = True
         
         return oldIdentifier
         
@@ -22,6 +24,7 @@ class Identifier():
     
     def write_to_id(self, id):
         self.nextTrackId = int(id)
+        self.dirty = False
             
     def provide_next_id(self) -> str:
         return self.nextTrackId
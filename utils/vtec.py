@@ -0,0 +1,72 @@
+import re
+
+'''
+P-VTEC parsing. Every VTEC product carries strings like /O.CON.KMLB.TO.W.0012.240415T1830Z-240415T1915Z/.
+An event is one (office, phenomena, significance, ETN, year); every product issued for it repeats that key
+with its own action, so continuity can be read off the key instead of pieced together from references or text.
+'''
+
+VTEC_PATTERN = re.compile(r"/([OTEX])\.([A-Z]{3})\.([A-Z]{4})\.([A-Z]{2})\.([A-Z])\.(\d{4})\.(\d{6}T\d{4}Z)-(\d{6}T\d{4}Z)/")
+
+NO_TIME = "000000T0000Z" # Begin time of events already in effect, end time of events that are open-ended.
+
+ENDING_ACTIONS = {"CAN", "EXP", "UPG"} # Last product of an event.
+
+class Vtec():
+    __slots__ = ("product", "action", "office", "phenomena", "significance", "etn", "begins", "ends", "year")
+
+    def __init__(self, product: str, action: str, office: str, phenomena: str, significance: str, etn: int, begins: str, ends: str, year: int):
+        self.product = product # O operational, T test, E experimental, X experimental in operational products.
+        self.action = action
+        self.office = office
+        self.phenomena = phenomena
+        self.significance = significance
+        self.etn = etn # Event tracking number, resets every year per office/phenomena/significance.
+        self.begins = begins
+        self.ends = ends
+        self.year = year
+
+    @property
+    def event(self) -> str: # Event key without the year.
+        return f"{self.office}.{self.phenomena}.{self.significance}.{self.etn:04d}"
+
+    @property
+    def key(self) -> str: # Event key as a string so it can be stored with the alert in json.
+        return f"{self.event}.{self.year}"
+
+    @property
+    def in_effect(self) -> bool: # Begin time is zeroed, so year is only a guess. An event issued in December is still going in January.
+        return self.begins == NO_TIME
+
+def _year(stamp: str) -> int | None:
+    return None if stamp == NO_TIME else 2000 + int(stamp[:2])
+
+def parse_vtec(strings, sent: str = "") -> list[Vtec]:
+    '''
+    Parse every VTEC string of an alert. strings can be one string or the list from the alert's parameters.
+    The year comes from the begin time, or the sent time / end time for events already in effect.
+    For those it can be a year late, see Vtec.in_effect. Callers with stored events should check the year against them.
+    '''
+    if isinstance(strings, str): strings = [strings]
+
+    sentYear = int(sent[:4]) if sent[:4].isdigit() else None
+    parsed = []
+
+    for text in strings or []:
+        for match in VTEC_PATTERN.finditer(text or ""):
+            product, action, office, phenomena, significance, etn, begins, ends = match.groups()
+            year = _year(begins) or sentYear or _year(ends)
+
+            if year is None: continue
+
+            parsed.append(Vtec(product, action, office, phenomena, significance, int(etn), begins, ends, year))
+
+    return parsed
+
+def primary_vtec(vtecs: list[Vtec]) -> Vtec | None: # The string describing the event the product is about, ex. the NEW half of an upgrade.
+    operational = [v for v in vtecs if v.product == "O"]
+
+    for v in operational:
+        if v.action not in ENDING_ACTIONS:
+            return v
+    return operational[0] if operational else None
@@ -1,9 +1,12 @@
-import requests
 import os
-from dotenv import load_dotenv
-load_dotenv('../sensitive.env')
+import json
+import time
+import asyncio
+import hashlib
+import config
 from config import countiesToMonitor as counties
 from services.syslogger import log
+from .http_client import httpClient
     
 '''
 Yes, I use a lot of print statements.
@@ -15,6 +18,31 @@ IGNORE_ZONES = [
     "https://api.weather.gov/zones/fire/FLZ163",
     "https://api.weather.gov/zones/fire/FLZ167",
 ]
+
+ZONE_LINKS = [
+    "https://api.weather.gov/zones?type=county&area=FL",
+    "https://api.weather.gov/zones?type=forecast&area=FL",
+    "https://api.weather.gov/zones?type=fire&area=FL",
+]
+
+'''
+Filtered zones and their geometry are saved to zoneCacheLocation once compiled.
+The cache key covers the monitored counties, the zone links and the ignore list, changing any of them throws the cache out.
+Bump ZONE_CACHE_VERSION if the cached layout changes.
+A warm restart reads the cache and makes no requests before the first alert cycle. Stale caches are still used and refreshed in the background.
+'''
+
+ZONE_CACHE_VERSION = 1
+zoneCacheLocation = "zone_cache.json"
+
+def zone_cache_key() -> str:
+    keyed = json.dumps({
+        "version": ZONE_CACHE_VERSION,
+        "counties": sorted(c.lower().strip() for c in counties),
+        "links": ZONE_LINKS,
+        "ignore": IGNORE_ZONES,
+    }, sort_keys=True)
+    return hashlib.sha256(keyed.encode()).hexdigest()
     
 class Zones():
     
@@ -23,11 +51,94 @@ class Zones():
         self.ZONE_TO_COUNTY_DESIGNATIONS = {} # Maps ZoneID to county name for easier reference.
         self.StateAppendixs = {} # Useful for comparing different possible counties and zones. Better if ref diff states.
         self.ZONE_GEOMETRY = {}
-        self.requestHeader = {'User-Agent': os.environ.get('HEADER')} # Creating header for requests to NWS API.
-        log.info("Initializing...")
+        self.savedAt = 0 # Epoch time the zone data was compiled at.
+        self.complete = False # Every zone came back with geometry. Partial data is used but never cached, and retried sooner.
+        self.revalidateTask = None
         self.determine_state_appendix() # Determine state appendixs for counties we monitor.
-        self.load_zones_and_filter() # Load zones and filter them for later use.
-        self.compile_zone_geometry()
+        
+    async def initialize(self): # Zones are fetched over the shared session, so this has to be awaited from inside the event loop before alerts are cycled.
+        log.info("Initializing...")
+        
+        if not self.load_cache(): # Cold start, nothing usable on disk. Alerts can't be filtered without zones, so wait on it.
+            await self.refresh()
+        
+        if self.revalidateTask is None:
+            self.revalidateTask = asyncio.create_task(self.revalidate())
+            
+    async def refresh(self): # Fetch and compile everything, then swap it in at once so alerts never see half a zone map.
+        zoneMap, designations = await self.load_zones_and_filter() # Load zones and filter them for later use.
+        geometry = await self.compile_zone_geometry(zoneMap)
+        complete = len(geometry) == len(zoneMap)
+        
+        if not complete: # Zones that didn't come back keep the geometry we already had for them, if any.
+            log.warn(f"Only {len(geometry)}/{len(zoneMap)} zone geometries loaded, keeping the previous geometry for the rest and not caching.")
+            geometry = {**{z: g for z, g in self.ZONE_GEOMETRY.items() if z in zoneMap}, **geometry}
+        
+        self.ZONE_MAP = zoneMap
+        self.ZONE_TO_COUNTY_DESIGNATIONS = designations
+        self.ZONE_GEOMETRY = geometry
+        self.savedAt = time.time()
+        self.complete = complete
+        
+        if complete: # A cache with holes in it would be trusted for zoneCacheHours.
+            self.save_cache()
+        
+    async def revalidate(self): # Runs for the life of the bot, refreshing zones whenever the cached copy goes stale.
+        ttl = config.zoneCacheHours * 3600
+        
+        while True:
+            wait = self.savedAt + ttl - time.time() if self.complete else min(ttl, 900) # Missing geometry is retried well before the cache would go stale.
+            await asyncio.sleep(max(0, wait))
+            
+            log.info("Zone cache is stale or incomplete, revalidating in the background.")
+            
+            try:
+                await self.refresh()
+            except Exception as e: # Anything, an odd feature or a dropped connection included. Keep the stale zones, they're far better than none. Try again later.
+                log.warn(f"Zone revalidation failed, keeping cached zones: {e}")
+                await asyncio.sleep(min(ttl, 900))
+                
+    def load_cache(self) -> bool:
+        try:
+            with open(zoneCacheLocation) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            log.info("No zone cache found.")
+            return False
+        except (OSError, ValueError) as e:
+            log.warn(f"Zone cache could not be read, ignoring it: {e}")
+            return False
+        
+        if data.get("key") != zone_cache_key():
+            log.info("Zone cache does not match the current configuration, ignoring it.")
+            return False
+        
+        self.ZONE_MAP = data["zoneMap"]
+        self.ZONE_TO_COUNTY_DESIGNATIONS = data["designations"]
+        self.ZONE_GEOMETRY = data["geometry"]
+        self.savedAt = data["savedAt"]
+        self.complete = True
+        
+        log.info(f"Loaded {len(self.ZONE_MAP)} zones and {len(self.ZONE_GEOMETRY)} zone geometries from cache.")
+        return True
+    
+    def save_cache(self):
+        data = {
+            "key": zone_cache_key(),
+            "savedAt": self.savedAt,
+            "zoneMap": self.ZONE_MAP,
+            "designations": self.ZONE_TO_COUNTY_DESIGNATIONS,
+            "geometry": self.ZONE_GEOMETRY,
+        }
+        
+        tempLocation = zoneCacheLocation + ".tmp"
+        
+        try:
+            with open(tempLocation, "w") as f:
+                json.dump(data, f)
+            os.replace(tempLocation, zoneCacheLocation) # Atomic, a crash mid-write can't leave a broken cache behind.
+        except OSError as e:
+            log.warn(f"ISSUE WHEN WRITING ZONE CACHE: {e}")
         
     def determine_state_appendix(self):
         for c in counties: 
@@ -39,7 +150,9 @@ class Zones():
                 log.info("Appendix already included.")
         
         
-    def load_zones_and_filter(self): # Load zones from NWS API and compile them. Then filter to figure out which ones we need.
+    async def load_zones_and_filter(self) -> tuple[dict, dict]: # Load zones from NWS API and compile them. Then filter to figure out which ones we need.
+        zoneMap = {}
+        designations = {}
         self.discretionaryZoneMap = {} # Discretionary zones are zones we will filter. We will place ones we care about in ZONE_MAP.
         self.countyNormalized = {}
         
@@ -60,20 +173,14 @@ class Zones():
         DON'T USE AREADESC. I will drill this into your head.
         '''
             
-        links = [
-            "https://api.weather.gov/zones?type=county&area=FL",
-            "https://api.weather.gov/zones?type=forecast&area=FL",
-            "https://api.weather.gov/zones?type=fire&area=FL",
-        ]
+        listings = await httpClient.get_many_json(ZONE_LINKS, config.zoneFetchConcurrency, config.zoneFetchRetries, config.zoneFetchBackoff, cache=False) # zone_cache.json keeps the result, no need to hold the bodies too.
             
-        for url in links:
-            resp = requests.get(url, headers=self.requestHeader)
+        for url in ZONE_LINKS:
+            r = listings.get(url)
             
-            try:
-                r = resp.json()
-            except Exception as e:
+            if r is None:
                 log.critical("ERROR IN PARSING COUNTY AREA JSON")
-                raise RuntimeError(f"Failed to parse County Area JSON from NWS: {e}")
+                raise RuntimeError(f"Failed to fetch or parse County Area JSON from NWS: {url}")
             
             if "features" not in r:
                 log.critical("NOAA API ERROR!!")
@@ -113,42 +220,48 @@ class Zones():
                 log.info(f"✅ Match found: {self.discretionaryZoneMap[zone]} matches monitored county {formattedZoneName}")
                 log.info(f"This matches with {zone}, which corresponds to {self.discretionaryZoneMap[zone]}")
                 log.info(f"Therefore, adding {zone} to ZONE_MAP.")
-                self.ZONE_MAP[zone] = zone
+                zoneMap[zone] = zone
                 parts = formattedZoneName.split(",")
-                self.ZONE_TO_COUNTY_DESIGNATIONS[zone] = parts[0]
+                designations[zone] = parts[0]
                 log.info(f"ZONE_TO_COUNTY_DESIGNATIONS updated: {zone} → {parts[0]}")
                     
-        log.info(f"ZONE_MAP compiled. Contains {len(self.ZONE_MAP)} entries after filtering.") 
-        log.info(f"Contains following zones: {self.ZONE_MAP}")
-        log.info(f"ZONE_TO_COUNTY_DESIGNATIONS: {self.ZONE_TO_COUNTY_DESIGNATIONS}")
+        log.info(f"ZONE_MAP compiled. Contains {len(zoneMap)} entries after filtering.") 
+        log.info(f"Contains following zones: {zoneMap}")
+        log.info(f"ZONE_TO_COUNTY_DESIGNATIONS: {designations}")
+        
+        return zoneMap, designations
     
-    def compile_zone_geometry(self): # We compile Zone geometry via calling each individual zone through the NOAA api.
-        # Notably, this process takes a few seconds for the code to handle. Minor delay.
-        for z in self.ZONE_MAP:
-            url = self.ZONE_MAP[z] # Fetch url based on zone id. Zone id is url API call.
+    async def compile_zone_geometry(self, zoneMap: dict) -> dict: # We compile Zone geometry via calling each individual zone through the NOAA api.
+        # Zones are fetched in parallel, bounded by zoneFetchConcurrency, so this takes about as long as the slowest zone.
+        geometry = {}
+        
+        responses = await httpClient.get_many_json(list(zoneMap.values()), config.zoneFetchConcurrency, config.zoneFetchRetries, config.zoneFetchBackoff, cache=False)
+        
+        for z in zoneMap:
+            url = zoneMap[z] # Fetch url based on zone id. Zone id is url API call.
             
-            resp = requests.get(url, headers=self.requestHeader)
+            r = responses.get(url)
             
-            try:
-                r = resp.json()
-            except Exception as e:
+            if not r:
                 log.warn(f"Failed to load data from {z}") # Don't need to raise a major error here, just note this zone id did not return data.
-                log.error(e)
+                continue
             
-            if r["geometry"]: # Filter.
+            if r.get("geometry"): # Filter.
                 geo = r["geometry"]
                 type = geo.get("type", "")
                 coords = geo.get("coordinates", [])
                 
                 if coords and type: # We have coords?
                     if type == "Polygon":
-                        self.ZONE_GEOMETRY[z] = [coords] # Coords go into our ZONE_GEOMETRY dictionary.
+                        geometry[z] = [coords] # Coords go into our ZONE_GEOMETRY dictionary.
                     elif type == "MultiPolygon":
-                        self.ZONE_GEOMETRY[z] = coords
+                        geometry[z] = coords
                 else:
                     log.warn(f"{z} failed to get zone geometry.") 
         
-        log.info(f"Completed compiling of zone geometry. {len(self.ZONE_GEOMETRY)} members.")
+        log.info(f"Completed compiling of zone geometry. {len(geometry)}/{len(zoneMap)} members.")
+        
+        return geometry
             
     def check_areas_impacted(self, zones: list) -> tuple[bool, list]: # Alerts contain zone information. Parsing the list of zones from that alert into here can return the areas which are affected. Returns zones in ZONE_MAP.
         impacted = [z for z in zones if z in self.ZONE_MAP]